@@ -1,36 +1,103 @@
 # app.py
 """
 Flask app: Assets management using Supabase (compatible with Supabase Python Client v2)
-- Fixed STT (index_num) behavior:
-  * ensures index_num is generated on insert
-  * fixes missing/null index_num by reindexing before listing
-  * reindexes after delete
+- STT (index) is never stored or reindexed; the list API sends rows in id order:
+  * nothing runs against the database at import time
+  * schema changes live in supabase/migrations and are applied manually
 - UI is embedded (same as your UI, serial-click opens history)
 """
 
 import os
 import tempfile
 from datetime import datetime, date
-from flask import Flask, request, jsonify, render_template_string, send_file
-from supabase import create_client
-import openpyxl
+from flask import Flask, request, jsonify, send_file
+from flask.json.provider import JSONProvider
+from supabase import create_client, ClientOptions
+import httpx
+from postgrest.exceptions import APIError
+import xlsxwriter
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
 import smtplib
 from email.mime.text import MIMEText
 import threading
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+import time
+import hashlib
+import gzip
+import orjson
+from flask_caching import Cache
+from flask_compress import Compress
+
+# orjson: encode nhanh hơn json chuẩn, tự serialize date/datetime
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Trả bytes trực tiếp, bỏ qua bước decode/encode lại của Flask
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=ORJSON_OPTIONS),
+            mimetype="application/json"
+        )
+
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Cache danh sách tài sản (xóa khi có thay đổi)
+# Dùng chung thư mục cho mọi worker gunicorn để xóa cache có hiệu lực ở tất cả
+ASSETS_CACHE_TIMEOUT = 30  # giây
+LOOKUP_CACHE_TIMEOUT = 300  # tra cứu tài sản theo serial/CLC/mã, xóa khi dữ liệu đổi
+cache = Cache(app, config={
+    "CACHE_TYPE": "FileSystemCache",
+    "CACHE_DIR": os.path.join(tempfile.gettempdir(), "assets-cache"),
+    "CACHE_DEFAULT_TIMEOUT": ASSETS_CACHE_TIMEOUT,
+})
 
 # Giới hạn upload: 5MB
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024
 
+# Nén gzip/br cho HTML và JSON
+app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'text/javascript', 'application/javascript']
+app.config['COMPRESS_LEVEL'] = 6
+app.config['COMPRESS_BR_LEVEL'] = 4
+Compress(app)
+
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Please set SUPABASE_URL and SUPABASE_KEY environment variables")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Một client dùng chung cho cả process: giữ kết nối keep-alive (HTTP/2) tới Supabase
+# thay vì bắt tay TLS lại cho mỗi request
+supabase_http = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=30,
+)
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=supabase_http))
+
+# Phân trang danh sách tài sản
+ASSETS_PAGE_SIZE = 200
+ASSETS_PAGE_MAX = 1000
+
+# Chỉ lấy các cột bảng tài sản trên UI dùng tới (thay vì select *)
+ASSET_LIST_COLUMNS = ",".join((
+    "id", "clc", "code", "bc_code", "declaration_no", "declaration_date",
+    "invoice_no", "invoice_date", "supplier", "name", "brand", "model",
+    "description", "serial", "location", "status", "import_date", "warranty_end",
+))
 
 # -----------------------
 # Helpers
@@ -84,7 +151,7 @@ def send_mail_async(invoice, serial):
         print("Send mail error:", e)
 
 def transform_asset_for_frontend(a):
-    """Map DB asset to frontend shape. index is added in api_list_assets."""
+    """Map DB asset to frontend shape."""
     if not a:
         return a
     return dict(a)
@@ -101,6 +168,79 @@ def normalize_dates(data):
             data[field] = None
     return data
 
+def postgrest_quote(value):
+    """Quote a value for use inside a PostgREST or_() filter."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def find_asset_by_identifier(identifier):
+    """Find one asset whose serial, CLC or code matches identifier (case-insensitive)."""
+    # dùng chung giữa các request/worker; invalidate_assets_cache() xóa khi có thay đổi
+    cache_key = "asset_by_identifier:" + identifier
+    asset = cache.get(cache_key)
+    if asset is not None:
+        return asset
+
+    # Khớp chính xác trước: OR các phép = dùng được index b-tree của từng cột
+    v = postgrest_quote(identifier)
+    res = (
+        supabase.table("assets")
+        .select("*")
+        .or_(f"code.eq.{v},clc.eq.{v},serial.eq.{v}")
+        .order("id")
+        .limit(1)
+        .execute()
+    )
+    # PostgREST đổi "*" thành "%" trong like/ilike và không escape được
+    # → identifier có "*" chỉ khớp chính xác, không thử ILIKE
+    if not res.data and "*" not in identifier:
+        # Không thấy → thử không phân biệt hoa thường (index trigram)
+        v = postgrest_quote(like_escape(identifier))
+        res = (
+            supabase.table("assets")
+            .select("*")
+            .or_(f"serial.ilike.{v},clc.ilike.{v},code.ilike.{v}")
+            .order("id")
+            .limit(1)
+            .execute()
+        )
+    asset = res.data[0] if res.data else None
+    if asset is not None:
+        cache.set(cache_key, asset, timeout=LOOKUP_CACHE_TIMEOUT)
+    return asset
+
+def is_unique_violation(e, constraint):
+    """True if a PostgREST error is a unique_violation (23505) raised by the given constraint."""
+    if not isinstance(e, APIError) or e.code != "23505":
+        return False
+    # Postgres ghi tên constraint trong message: ... unique constraint "assets_code_unique"
+    return constraint in f"{e.message} {e.details}"
+
+def missing_fields(data, required):
+    return [k for k in required if not data.get(k)]
+
+def build_fault_entry(body):
+    return {
+        "fault": body.get("fault"),
+        "fault_date": body.get("fault_date"),
+        "sent_date": body.get("sent_date"),
+        "return_date": body.get("return_date"),
+    }
+
+def build_calib_entry(body):
+    return {
+        "calib_date": body.get("calib_date"),
+        "expire_date": body.get("expire_date"),
+    }
+
+# Loại lịch sử → (trường bắt buộc, hàm dựng bản ghi)
+HISTORY_TYPES = {
+    "fault": (("fault", "fault_date"), build_fault_entry),
+    "calib": (("calib_date", "expire_date"), build_calib_entry),
+}
+
 # -----------------------
 # Routes (API + UI)
 # -----------------------
@@ -262,8 +402,11 @@ INDEX_HTML = r'''
               <th><input data-col="17" oninput="applyFilters()"></th>
           </tr>
         </thead>
-        <tbody id="tbody"></tbody>
+        <tbody id="tbody">
+          <tr><td colspan="19" class="text-muted">Đang tải...</td></tr>
+        </tbody>
       </table>
+      <div id="rowsSentinel"></div>
     </div>
   </div>
 </div>
@@ -330,14 +473,24 @@ INDEX_HTML = r'''
 <!-- Delete -->
 <div class="modal" id="modalDelete" tabindex="-1"><div class="modal-dialog"><div class="modal-content">
   <div class="modal-header"><h5 class="modal-title">Xóa tài sản</h5><button class="btn-close" data-bs-dismiss="modal"></button></div>
-  <div class="mb-2">
-    <label class="form-label">Serial</label>
-    <input id="del_serial" class="form-control" placeholder="Nhập Serial">
-  </div>
+  <div class="modal-body">
+    <div id="delAlert" class="alert alert-danger d-none"></div>
+    <div class="mb-2">
+      <label class="form-label">Serial</label>
+      <input id="del_serial" class="form-control" placeholder="Nhập Serial" oninput="resetDeleteModal()">
+    </div>
+
+    <div class="mb-2">
+      <label class="form-label">Số Invoice</label>
+      <input id="del_invoice" class="form-control" placeholder="Nhập Số invoice" oninput="resetDeleteModal()">
+    </div>
 
-  <div class="mb-2">
-    <label class="form-label">Số Invoice</label>
-    <input id="del_invoice" class="form-control" placeholder="Nhập Số invoice">
+    <!-- Bước xác nhận ngay trong modal (không dùng confirm()) -->
+    <div id="delConfirm" class="alert alert-warning d-none">
+      <div id="delConfirmText" class="mb-2">Bạn có chắc muốn xóa tài sản?</div>
+      <button class="btn btn-sm btn-danger" onclick="confirmDelete()">Xóa</button>
+      <button class="btn btn-sm btn-secondary ms-1" onclick="cancelDelete()">Không</button>
+    </div>
   </div>
   <div class="modal-footer"><button class="btn btn-secondary" data-bs-dismiss="modal">Đóng</button><button class="btn btn-danger" onclick="doDelete()">Xóa</button></div>
 </div></div></div>
@@ -351,7 +504,7 @@ INDEX_HTML = r'''
     <!-- Lookup by CLC or Serial -->
     <div class="mb-2"><label class="form-label">Tìm tài sản (Số CLC hoặc Serial)</label>
       <div class="d-flex">
-        <input id="hist_lookup" class="form-control me-2" placeholder="Nhập Số CLC hoặc Serial">
+        <input id="hist_lookup" class="form-control me-2" placeholder="Nhập Số CLC hoặc Serial" oninput="scheduleLookup()">
         <button class="btn btn-outline-primary" onclick="lookupAssetForHist()">Tìm</button>
       </div>
       <div id="hist_found" class="mt-2 small text-muted"></div>
@@ -396,841 +549,7 @@ INDEX_HTML = r'''
 
 </div>
 <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js"></script>
-<script>
-const addModal = new bootstrap.Modal(document.getElementById('modalAdd'));
-const editModal = new bootstrap.Modal(document.getElementById('modalEdit'));
-const delModal = new bootstrap.Modal(document.getElementById('modalDelete'));
-const histModal = new bootstrap.Modal(document.getElementById('modalHist'));
-
-let hist_target_identifier = null; // will store the identifier (could be clc, code, or serial)
-let assetCache = [];
-
-function openAdd(){
-
-  document.getElementById('addAlert').classList.add('d-none');
-
-  document.getElementById('add_declaration_date').value='';
-  document.getElementById('add_invoice_date').value='';
-  document.getElementById('add_import').value='';
-  document.getElementById('add_warranty').value='';
-
-  addModal.show();
-}
-function openEdit(){ document.getElementById('editAlert').classList.add('d-none'); editModal.show(); }
-function openDelete(){ delModal.show(); }
-function openHist(){ document.getElementById('histAlert').classList.add('d-none'); document.getElementById('hist_found').innerText=''; hist_target_identifier = null; histModal.show(); }
-
-function updateFilteredAssets(){
-  const table = document.getElementById('assetTable');
-  const rows = table.tBodies[0].rows;
-
-  let count = 0;
-  for (const r of rows){
-    if (!r.classList.contains("history-row") && r.style.display !== "none") {
-      count++;
-    }
-  }
-
-  document.getElementById("filteredAssets").innerText =
-      "Số tài sản đang được lọc: " + count;
-}
-
-async function loadTable(){
-  const res = await fetch("/api/assets");
-  assetCache = await res.json();
-  renderTable(assetCache);
-  updateTotalAssets();
-  updateFilteredAssets();
-}
-
-function updateTotalAssets(){
-  const total = assetCache.length;
-  document.getElementById("totalAssets").innerText =
-      "Tổng số tài sản: " + total;
-}
-
-function renderTable(list){
-  const tbody = document.querySelector("#assetTable tbody");
-  tbody.innerHTML = "";
-  for(const a of list){
-    tbody.appendChild(renderRow(a));
-  }
-}
-
-function renderRow(a){
-  const tr = document.createElement("tr");
-  tr.style.cursor = "pointer";
-  tr.addEventListener("click", function(e){
-    // tránh click vào button bên trong history
-    if(e.target.closest("span")) return;
-    if(e.target.tagName === "BUTTON") return;
-    toggleHistory(tr, a.serial);
-  });
-
-  tr.dataset.id = a.id;
-  tr.dataset.serial = a.serial || "";
-
-  // Tính hiệu lực bảo hành
-  let statusWarranty = "";
-  const today = new Date();
-
-  if (a.warranty_end) {
-    const d = new Date(a.warranty_end);
-
-    if (!isNaN(d.getTime())) {
-      // Có giá trị hợp lệ
-      statusWarranty = d >= today ? "Còn hạn" : "Hết hạn";
-    } else {
-      // Không parse được ngày → để rỗng
-      statusWarranty = "";
-    }
-  } else {
-    // Không có ngày bảo hành → để rỗng
-    statusWarranty = "";
-  }
-
-
-  tr.innerHTML = `
-    <td style="text-align:center;white-space:nowrap">
-
-      <span style="cursor:pointer;font-size:16px;margin-right:6px"
-        onclick="openEditFromRow(${a.id})">🔧</span>
-      <span style="cursor:pointer;font-size:16px";margin-right:6px"
-        onclick="openHistoryFromRow(${a.id})">📘</span>
-      <span style="cursor:pointer;font-size:16px;color:#dc3545"
-        onclick="deleteAssetFromRow(${a.id})">🗑️</span>
-
-    </td>
-
-    <td>${a.clc || ""}</td>
-    <td>${a.code || ""}</td>
-    <td>${a.bc_code || ""}</td>
-    <td>${a.declaration_no || ""}</td>
-    <td>${a.declaration_date || ""}</td>
-    <td>${a.invoice_no || ""}</td>
-    <td>${a.invoice_date || ""}</td>
-    <td>${a.supplier || ""}</td>
-    <td>${a.name || ""}</td>
-    <td>${a.brand || ""}</td>
-    <td>${a.model || ""}</td>
-    <td>${a.description || ""}</td>
-    <td>${a.serial || ""}</td>
-    <td>${a.location || ""}</td>
-    <td>${a.status || ""}</td>
-    <td>${a.import_date || ""}</td>
-    <td>${a.warranty_end || ""}</td>
-    <td style="font-weight:600; color:${statusWarranty === "Còn hạn" ? "green" : "red"}">${statusWarranty}</td>
-  `;
-
-  return tr;
-}
-
-function updateRowById(id, updated){
-
-  const tr = document.querySelector(`#assetTable tr[data-id="${id}"]`);
-
-  if(!tr) return;
-
-  const newRow = renderRow(updated);
-
-  tr.innerHTML = newRow.innerHTML;
-
-  // update dataset
-  tr.dataset.serial = updated.serial || "";
-}
-
-function appendRow(a){
-  const tbody = document.querySelector("#assetTable tbody");
-  tbody.appendChild(renderRow(a));
-}
-
-
-function applyFilters(){
-  const table = document.getElementById('assetTable');
-  const filters = Array.from(table.tHead.rows[1].querySelectorAll('input')).map(i=>i.value.trim().toLowerCase());
-  const rows = table.tBodies[0].rows;
-  for(const r of rows){
-    if(r.classList && r.classList.contains('history-row')) continue;
-    let visible = true;
-    for(let c=0;c<filters.length;c++){
-      if(!filters[c]) continue;
-      const cell = r.cells[c];
-      if(!cell || cell.textContent.toLowerCase().indexOf(filters[c]) === -1){ visible = false; break; }
-    }
-    r.style.display = visible ? '' : 'none';
-    const next = r.nextSibling;
-    if(next && next.classList && next.classList.contains('history-row')) next.style.display = visible ? '' : 'none';
-    updateFilteredAssets();
-  }
-}
-
-let sortState = {}; // lưu trạng thái sort từng cột
-
-function updateSortIcons(columnIndex, state) {
-  const icons = document.querySelectorAll("#assetTable thead tr:first-child th .sort-icon");
-  icons.forEach(i => {
-    i.classList.remove("active");
-    i.textContent = "↕"; // reset
-  });
-
-  const currentIcon = document.querySelector(`#assetTable thead tr:first-child th:nth-child(${columnIndex + 1}) .sort-icon`);
-  if (!currentIcon) return;
-
-  if (state === "asc") {
-    currentIcon.textContent = "A↓Z";
-    currentIcon.classList.add("active");
-  }
-  else if (state === "desc") {
-    currentIcon.textContent = "Z↑A";
-    currentIcon.classList.add("active");
-  }
-}
-
-const columnMap = [
-  "clc",
-  "code",
-  "bc_code",
-  "declaration_no",
-  "declaration_date",
-  "invoice_no",
-  "invoice_date",
-  "supplier",
-  "name",
-  "brand",
-  "model",
-  "description",
-  "serial",
-  "location",
-  "status",
-  "import_date",
-  "warranty_end",
-  null
-];
-
-function sortTable(columnIndex) {
-  const field = columnMap[columnIndex];
-  if (!field) return; // cột không sort
-
-  const state = sortState[columnIndex] || "none";
-  const newState = state === "none" ? "asc" : state === "asc" ? "desc" : "none";
-  sortState[columnIndex] = newState;
-
-  updateSortIcons(columnIndex, newState);
-
-  let data = [...assetCache];
-
-  if (newState !== "none") {
-    data.sort((a, b) => {
-      const valA = a[field] || "";
-      const valB = b[field] || "";
-
-      // Ngày → sort đúng dạng date
-      if (field === "import_date" || field === "warranty_end") {
-        return newState === "asc"
-          ? new Date(valA) - new Date(valB)
-          : new Date(valB) - new Date(valA);
-      }
-
-      // Mặc định A-Z
-      return newState === "asc"
-        ? String(valA).localeCompare(String(valB), "vi")
-        : String(valB).localeCompare(String(valA), "vi");
-    });
-  }
-
-  renderTable(data);
-  applyFilters();
-  updateFilteredAssets();
-}
-
-
-function initSorting() {
-  const headers = document.querySelectorAll("#assetTable thead tr:first-child th.sortable");
-  headers.forEach((th, index) => {
-    th.addEventListener("click", () => sortTable(index));
-  });
-}
-
-function formatFileSize(bytes) {
-  if (!bytes) return "";
-  const kb = bytes / 1024;
-  if (kb < 1024) return kb.toFixed(1) + " KB";
-  return (kb / 1024).toFixed(2) + " MB";
-}
-
-function openEditFromRow(id){
-
-  const a = assetCache.find(x => x.id === id);
-  if(!a){
-    alert("Không tìm thấy asset");
-    return;
-  }
-  document.getElementById('edit_serial').dataset.assetId = id;
-
-  if(!a){
-    alert("Không tìm thấy asset");
-    return;
-  }
-
-  document.getElementById('edit_code').value = a.code || '';
-  document.getElementById('edit_bc_code').value = a.bc_code || '';
-  document.getElementById('edit_clc').value = a.clc || '';
-  document.getElementById('edit_name').value = a.name || '';
-  document.getElementById('edit_brand').value = a.brand || '';
-  document.getElementById('edit_model').value = a.model || '';
-  document.getElementById('edit_serial').value = a.serial || '';
-  document.getElementById('edit_location').value = a.location || '';
-  document.getElementById('edit_status').value = a.status || '';
-  document.getElementById('edit_import').value = a.import_date || '';
-  document.getElementById('edit_warranty').value = a.warranty_end || '';
-  document.getElementById('edit_description').value = a.description || '';
-  document.getElementById('edit_invoice_no').value = a.invoice_no || '';
-  document.getElementById('edit_declaration_no').value = a.declaration_no || '';
-  document.getElementById('edit_supplier').value = a.supplier || '';
-  document.getElementById('edit_declaration_date').value = a.declaration_date || '';
-  document.getElementById('edit_invoice_date').value = a.invoice_date || '';
-
-  document.getElementById('editForm').style.display = 'block';
-
-  editModal.show();
-}
-
-function openHistoryFromRow(id){
-
-  const a = assetCache.find(x => x.id == id);
-
-  if(!a){
-    alert("Không tìm thấy asset");
-    return;
-  }
-
-  // dùng serial làm identifier cho history
-  hist_target_identifier = a.serial;
-
-  if(!a.serial){
-    alert("Tài sản này chưa có serial nên chưa thể thêm lịch sử.");
-    return;
-  }
-
-  document.getElementById("hist_lookup").value = a.serial;
-
-  document.getElementById("hist_found").innerText =
-    `Serial: ${a.serial} | Tên: ${a.name || ""} | CLC: ${a.clc || ""}`;
-
-  document.getElementById("histAlert").classList.add("d-none");
-
-  histModal.show();
-}
-
-async function deleteAssetFromRow(id){
-
-  const a = assetCache.find(x => x.id == id);
-
-  if(!a){
-    alert("Không tìm thấy asset");
-    return;
-  }
-
-  const msg =
-    "Bạn có chắc muốn xóa tài sản:\n\n" +
-    "Mã tài sản: " + (a.code || "") + "\n" +
-    "Số invoice: " + (a.invoice_no || "") + "\n" +
-    "Serial: " + (a.serial || "") + "\n";
-
-  if(!confirm(msg)) return;
-
-  let url = "/api/assets/delete?";
-
-  if(a.serial){
-    url += "serial=" + encodeURIComponent(a.serial);
-  }else if(a.invoice_no){
-    url += "invoice=" + encodeURIComponent(a.invoice_no);
-  }else{
-    alert("Không xác định được asset để xóa");
-    return;
-  }
-
-  const res = await fetch(url,{method:'DELETE'});
-  const data = await res.json();
-
-  if(!res.ok){
-    alert(data.error || "Xóa thất bại");
-    return;
-  }
-
-  // Xóa khỏi cache
-  assetCache = assetCache.filter(x => x.id != id);
-
-  // Xóa row khỏi table
-  const tr = document.querySelector(`#assetTable tr[data-id="${id}"]`);
-  if(tr) tr.remove();
-
-  updateTotalAssets();
-  updateFilteredAssets();
-
-  alert("Đã xóa tài sản");
-}
-
-async function doAdd(){
-  const payload = {
-    clc: document.getElementById('add_clc').value.trim(),
-    code: document.getElementById('add_code').value.trim(),
-    bc_code: document.getElementById('add_bc_code').value.trim(),
-    declaration_no: document.getElementById('add_declaration_no').value.trim(),
-    declaration_date: document.getElementById('add_declaration_date').value,
-    invoice_no: document.getElementById('add_invoice_no').value.trim(),
-    invoice_date: document.getElementById('add_invoice_date').value,
-    supplier: document.getElementById('add_supplier').value.trim(),
-    name: document.getElementById('add_name').value.trim(),
-    brand: document.getElementById('add_brand').value.trim(),
-    model: document.getElementById('add_model').value.trim(),
-    serial: document.getElementById('add_serial').value.trim(),
-    location: document.getElementById('add_location').value.trim(),
-    status: document.getElementById('add_status').value,
-    import_date: document.getElementById('add_import').value,
-    warranty_end: document.getElementById('add_warranty').value,
-    description: document.getElementById('add_description').value.trim()
-  };
-  const res = await fetch('/api/assets', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(payload)});
-  const data = await res.json();
-  if(!res.ok){
-    const el = document.getElementById('addAlert'); el.classList.remove('d-none');
-    if(data.missing_fields) el.innerText = data.error + ': ' + data.missing_fields.join(', '); else el.innerText = data.error || 'Có lỗi';
-    return;
-  }
-  appendRow(data);     // thêm dòng mới
-  assetCache.push(data);  // cập nhật cache
-  updateTotalAssets();
-  addModal.hide();
-  ['add_clc','add_code','add_name','add_brand','add_model','add_serial','add_location',
-  'add_import','add_warranty','add_description',
-  'add_declaration_date','add_invoice_date']
-  .forEach(id=>document.getElementById(id).value='');
-}
-
-
-async function doEdit() {
-
-  const assetId = document.getElementById('edit_serial').dataset.assetId;
-
-  const payload = {
-    clc: document.getElementById('edit_clc').value.trim(),
-    code: document.getElementById('edit_code').value.trim(),
-    bc_code: document.getElementById('edit_bc_code').value.trim(),
-    declaration_no: document.getElementById('edit_declaration_no').value.trim(),
-    declaration_date: document.getElementById('edit_declaration_date').value,
-    invoice_no: document.getElementById('edit_invoice_no').value.trim(),
-    invoice_date: document.getElementById('edit_invoice_date').value,
-    supplier: document.getElementById('edit_supplier').value.trim(),
-    name: document.getElementById('edit_name').value.trim(),
-    brand: document.getElementById('edit_brand').value.trim(),
-    model: document.getElementById('edit_model').value.trim(),
-    serial: document.getElementById('edit_serial').value.trim(),
-    location: document.getElementById('edit_location').value.trim(),
-    status: document.getElementById('edit_status').value,
-    import_date: document.getElementById('edit_import').value,
-    warranty_end: document.getElementById('edit_warranty').value,
-    description: document.getElementById('edit_description').value.trim()
-  };
-
-  const res = await fetch('/api/assets/' + assetId, {
-    method:'PUT',
-    headers:{'Content-Type':'application/json'},
-    body: JSON.stringify(payload)
-  });
-
-  const data = await res.json();
-
-  if (!res.ok) {
-    const alert = document.getElementById('editAlert');
-    alert.classList.remove('d-none');
-    alert.innerText = data.error || "Có lỗi khi cập nhật";
-    return;
-  }
-
-  updateRowById(assetId, data);
-
-  const idx = assetCache.findIndex(a => a.id == assetId);
-  if (idx !== -1) assetCache[idx] = data;
-
-  editModal.hide();
-
-  document.getElementById('edit_declaration_date').value='';
-  document.getElementById('edit_invoice_date').value='';
-  document.getElementById('edit_import').value='';
-  document.getElementById('edit_warranty').value='';
-}
-
-
-async function doDelete(){
-
-  const serial = document.getElementById('del_serial').value.trim();
-  const invoice = document.getElementById('del_invoice').value.trim();
-
-  if(!serial && !invoice){
-    alert("Nhập Serial hoặc Số invoice để xóa");
-    return;
-  }
-
-  let url = "/api/assets/delete?";
-  if(serial){
-    url += "serial=" + encodeURIComponent(serial);
-  }
-  else{
-    url += "invoice=" + encodeURIComponent(invoice);
-  }
-
-  if(!confirm("Bạn có chắc muốn xóa tài sản?")) return;
-
-  const res = await fetch(url,{
-    method:'DELETE'
-  });
-
-  const data = await res.json();
-
-  if(!res.ok){
-    alert(data.error || "Có lỗi khi xóa");
-    return;
-  }
-
-  alert(data.message || "Xóa thành công");
-
-  delModal.hide();
-  loadTable();
-
-  document.getElementById('del_serial').value = "";
-  document.getElementById('del_invoice').value = "";
-}
-
-// lookup asset by CLC or Serial for history modal
-async function lookupAssetForHist() {
-  const v = document.getElementById('hist_lookup').value.trim();
-  const el = document.getElementById('hist_found'); 
-  el.innerText = '';
-
-  if (!v) {
-    el.innerText = 'Nhập Số CLC hoặc Serial để tìm';
-    return;
-  }
-
-  const res = await fetch('/api/assets');
-  const list = await res.json();
-
-  // Tìm theo serial hoặc CLC
-  const found = list.find(a => 
-      (a.serial && a.serial.toLowerCase() === v.toLowerCase()) ||
-      (a.clc && a.clc.toLowerCase() === v.toLowerCase())
-  );
-
-  if (!found) {
-    el.innerText = 'Không tìm thấy tài sản';
-    hist_target_identifier = null;
-    return;
-  }
-
-  // Quan trọng: chỉ lấy serial
-  hist_target_identifier = found.serial;
-
-  el.innerText = `Tìm thấy: Serial=${found.serial}, Tên=${found.name}, CLC=${found.clc || ''}`;
-  updateTotalAssets();
-}
-
-
-function onHistTypeChange(){
-  const t = document.getElementById('hist_type').value;
-  document.getElementById('hist_fault_form').style.display = t === 'fault' ? 'block' : 'none';
-  document.getElementById('hist_calib_form').style.display = t === 'calib' ? 'block' : 'none';
-}
-
-function openGuide(){
-  document.getElementById("guideOverlay").style.display="flex";
-}
-
-function closeGuide(){
-  document.getElementById("guideOverlay").style.display="none";
-}
-
-function showGuide(type){
-
-  const images = {
-    add: "/static/guide_add.png",
-    edit: "/static/guide_edit.png",
-    history: "/static/guides_history.png",
-    delete: "/static/guide_delete.png"
-  };
-
-  document.getElementById("guideOverlay").style.display="none";
-
-  const img = document.getElementById("guideImage");
-  img.src = images[type];
-
-  document.getElementById("guideImageOverlay").style.display="flex";
-}
-
-function closeGuideImage(){
-  document.getElementById("guideImageOverlay").style.display="none";
-}
-
-async function doAddHistory(){
-  if(!hist_target_identifier){
-    const el = document.getElementById('histAlert'); 
-    el.classList.remove('d-none'); 
-    el.innerText = 'Bạn phải tìm và chọn tài sản bằng Serial hoặc CLC trước.';
-    return;
-  }
-
-  const type = document.getElementById('hist_type').value;
-
-  let payload = { 
-    serial: hist_target_identifier, 
-    type 
-  };
-
-  if(type === 'fault'){
-    payload.fault = document.getElementById('hist_fault').value.trim();
-    payload.fault_date = document.getElementById('hist_fault_date').value;
-    payload.sent_date = document.getElementById('hist_sent').value;
-    payload.return_date = document.getElementById('hist_return').value || '';
-  } 
-  else {
-    payload.calib_date = document.getElementById('hist_calib_date').value;
-    payload.expire_date = document.getElementById('hist_expire_date').value;
-  }
-
-  const res = await fetch('/api/assets/history', {
-    method:'POST', 
-    headers:{'Content-Type':'application/json'}, 
-    body: JSON.stringify(payload)
-  });
-
-  const data = await res.json();
-
-  if(!res.ok){
-    const el = document.getElementById('histAlert'); 
-    el.classList.remove('d-none'); 
-    
-    if(data.missing_fields)
-      el.innerText = data.error + ': ' + data.missing_fields.join(', ');
-    else 
-      el.innerText = data.error || 'Có lỗi';
-
-    return;
-  }
-
-  histModal.hide(); 
-  loadTable();
-
-  ['hist_lookup','hist_fault','hist_fault_date','hist_sent','hist_return','hist_calib_date','hist_expire_date']
-    .forEach(id => document.getElementById(id).value='');
-
-  hist_target_identifier = null;
-}
-
-let historyLoading = {};
-
-async function toggleHistory(row, serial){
-
-  if(historyLoading[serial]) return;
-  historyLoading[serial] = true;
-
-  let next = row.nextSibling;
-
-  // nếu đang mở → đóng
-  if(next && next.classList && next.classList.contains('history-row')){
-    next.remove();
-    historyLoading[serial] = false;
-    return;
-  }
-
-  const res = await fetch('/api/assets/history/' + encodeURIComponent(serial));
-  const data = await res.json();
-
-  const tr = document.createElement('tr');
-  tr.classList.add('history-row');
-
-  const td = document.createElement('td');
-  td.colSpan = 12;
-
-  // render history như cũ
-  let historyHtml = '';
-
-  if(data.error || data.length === 0){
-    historyHtml = '<em>Chưa có lịch sử</em>';
-  } else {
-    const faults = data.filter(h => h.type === 'fault');
-    const calibs = data.filter(h => h.type === 'calib');
-
-    historyHtml += '<h6>Lịch sử lỗi</h6>';
-
-    if(faults.length){
-      historyHtml += `<table class="table table-sm">
-      <thead><tr><th>Seq</th><th>Tên lỗi</th><th>Ngày lỗi</th><th>Ngày gửi</th><th>Ngày nhận</th></tr></thead><tbody>`;
-
-      for(const h of faults){
-        historyHtml += `<tr>
-        <td>${h.seq}</td>
-        <td>${h.fault || ''}</td>
-        <td>${h.fault_date || ''}</td>
-        <td>${h.sent_date || ''}</td>
-        <td>${h.return_date || ''}</td>
-        </tr>`;
-      }
-
-      historyHtml += '</tbody></table>';
-    } else {
-      historyHtml += '<div><em>Không có</em></div>';
-    }
-
-    historyHtml += '<h6 class="mt-3">Lịch sử Calib</h6>';
-
-    if(calibs.length){
-      historyHtml += `<table class="table table-sm">
-      <thead><tr><th>Seq</th><th>Ngày calib</th><th>Ngày hết hạn</th></tr></thead><tbody>`;
-
-      for(const h of calibs){
-        historyHtml += `<tr>
-        <td>${h.seq}</td>
-        <td>${h.calib_date || ''}</td>
-        <td>${h.expire_date || ''}</td>
-        </tr>`;
-      }
-
-      historyHtml += '</tbody></table>';
-    } else {
-      historyHtml += '<div><em>Không có</em></div>';
-    }
-  }
-
-  const filesHtml = await renderFiles(serial);
-
-  td.innerHTML = `
-  <div class="row">
-    <div class="col-md-7">${historyHtml}</div>
-    <div class="col-md-5">
-      <h6>📎 File đính kèm</h6>
-      ${filesHtml}
-    </div>
-  </div>`;
-
-  tr.appendChild(td);
-  row.parentNode.insertBefore(tr, row.nextSibling);
-
-  historyLoading[serial] = false;
-}
-
-async function uploadFiles(serial) {
-  const input = document.getElementById(`file_input_${serial}`);
-  if (!input || input.files.length === 0) {
-    alert("Chọn ít nhất 1 file");
-    return;
-  }
-
-  const fd = new FormData();
-  for (const f of input.files) {
-    fd.append("files", f);
-  }
-
-  const res = await fetch(`/api/assets/${encodeURIComponent(serial)}/files`, {
-    method: "POST",
-    body: fd
-  });
-
-  if (!res.ok) {
-    let msg = "Upload file thất bại";
-    try {
-      const data = await res.json();
-      if (data.error) msg = data.error;
-    } catch (e) {}
-
-    alert(msg);
-    return;
-  }
-
-
-  // Reload lại history + file
-  toggleHistory(
-    document.querySelector(`tr[data-serial="${serial}"]`),
-    serial
-  );
-}
-
-
-async function renderFiles(serial) {
-  const res = await fetch(`/api/assets/${encodeURIComponent(serial)}/files`);
-  const files = await res.json();
-
-  let html = `
-    <div class="mb-2">
-      <input type="file" id="file_input_${serial}" class="form-control form-control-sm" multiple>
-      <button class="btn btn-sm btn-success mt-1"
-        onclick="uploadFiles('${serial}')">Thêm file</button>
-    </div>
-  `;
-
-  if (!files.length) {
-    html += "<em>Chưa có file đính kèm</em>";
-    return html;
-  }
-
-  html += `
-    <table class="table table-sm">
-      <thead>
-        <tr>
-          <th>Tên file</th>
-          <th>Dung lượng</th>
-          <th>Ngày</th>
-          <th width="120">Thao tác</th>
-        </tr>
-      </thead>
-      <tbody>
-  `;
-
-  for (const f of files) {
-    html += `
-      <tr>
-        <td>${f.file_name}</td>
-        <td>${formatFileSize(f.file_size)}</td>
-        <td>${(f.created_at || "").substring(0,10)}</td>
-        <td>
-          <button class="btn btn-sm btn-outline-primary"
-            onclick="downloadFile('${f.id}')">Tải</button>
-          <button class="btn btn-sm btn-outline-danger ms-1"
-            onclick="deleteFile('${f.id}', '${serial}')">Xóa</button>
-        </td>
-      </tr>
-    `;
-  }
-
-  html += "</tbody></table>";
-  return html;
-}
-
-
-async function downloadFile(id) {
-  const res = await fetch(`/api/assets/files/${id}/download`);
-  const data = await res.json();
-  if (data.url) window.open(data.url, "_blank");
-}
-
-async function deleteFile(id, serial) {
-  if (!confirm("Bạn có chắc muốn xóa file này?")) return;
-
-  const res = await fetch(`/api/assets/files/${id}`, { method: "DELETE" });
-  if (!res.ok) return alert("Xóa file thất bại");
-
-  // reload lại history + file
-  toggleHistory(
-    document.querySelector(`tr[data-serial="${serial}"]`),
-    serial
-  );
-}
-
-
-document.addEventListener('DOMContentLoaded', ()=>{
-  loadTable();
-  initSorting();
-});
-</script>
+<script src="/static/app.js?v=__APP_JS_VERSION__" defer></script>
 <div id="guideOverlay" class="guide-overlay">
 
   <div class="guide-menu">
@@ -1259,29 +578,150 @@ document.addEventListener('DOMContentLoaded', ()=>{
 </html>
 '''
 
+# JS tách ra static/app.js; URL mang hash nội dung nên trình duyệt cache lâu dài
+APP_JS_PATH = os.path.join(app.static_folder, "app.js")
+with open(APP_JS_PATH, "rb") as f:
+    APP_JS_VERSION = hashlib.md5(f.read()).hexdigest()[:12]
+INDEX_HTML = INDEX_HTML.replace("__APP_JS_VERSION__", APP_JS_VERSION)
+
+# Trang chủ tĩnh → encode + nén sẵn một lần lúc import
+INDEX_HTML_BYTES = INDEX_HTML.encode("utf-8")
+INDEX_HTML_GZIP = gzip.compress(INDEX_HTML_BYTES, compresslevel=9)
+INDEX_HTML_ETAG = hashlib.md5(INDEX_HTML_BYTES).hexdigest()
+
+@app.after_request
+def cache_versioned_static(resp):
+    if request.path == "/static/app.js" and request.args.get("v") == APP_JS_VERSION:
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
 @app.route('/')
 def index_page():
-    return render_template_string(INDEX_HTML)
+    # INDEX_HTML không có biến Jinja → trả thẳng bản đã nén sẵn
+    use_gzip = "gzip" in request.accept_encodings
+    resp = app.response_class(
+        INDEX_HTML_GZIP if use_gzip else INDEX_HTML_BYTES,
+        mimetype="text/html"
+    )
+    if use_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "public, max-age=300"
+    resp.set_etag(INDEX_HTML_ETAG + ("-gzip" if use_gzip else ""))
+    return resp.make_conditional(request)
 
 # ---- API: list assets ----
 @app.route("/api/assets", methods=["GET"])
 def api_list_assets():
     try:
-        res = supabase.table("assets").select("*").order("id", desc=False).execute()
-        assets = res.data or []
+        payload, payload_gzip, etag = list_assets_payload()
+    except ValueError:
+        return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+    except Exception as e:
+        app.logger.error("api_list_assets error: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+    # gửi bản gzip đã nén sẵn theo cache, Flask-Compress bỏ qua vì đã có Content-Encoding
+    use_gzip = "gzip" in request.accept_encodings
+    resp = app.response_class(payload_gzip if use_gzip else payload, mimetype="application/json")
+    if use_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.set_etag(etag + ("-gzip" if use_gzip else ""))
+    resp.headers["Cache-Control"] = "private, must-revalidate"
+    # If-None-Match khớp → 304, không gửi lại body
+    return resp.make_conditional(request)
+
+# Payload đã serialize giữ ngay trong process, gắn với "phiên bản" lưu ở cache
+# dùng chung. Xóa cache → phiên bản mới → mọi worker bỏ bản cũ của mình.
+_assets_local = {}
+_assets_local_version = None
+_assets_local_lock = threading.Lock()
+
+def assets_cache_version():
+    version = cache.get("assets_version")
+    if version is None:
+        # hết hạn (TTL) hoặc vừa bị xóa → tạo phiên bản mới
+        cache.add("assets_version", time.time_ns())
+        version = cache.get("assets_version")
+    return version
+
+def list_assets_payload():
+    """Serialized body of GET /api/assets, its gzip copy and ETag, cached per query string."""
+    global _assets_local_version
+
+    version = assets_cache_version()
+    key = request.query_string
+
+    with _assets_local_lock:
+        if _assets_local_version != version:
+            _assets_local.clear()
+            _assets_local_version = version
+        hit = _assets_local.get(key)
+    if hit is not None:
+        return hit
+
+    # Phân trang keyset: ?after_id=<id>&limit=<n> → {"items": [...], "next_after": id|null}
+    if "limit" in request.args or "after_id" in request.args:
+        body = fetch_assets_page()
+    else:
+        body = fetch_all_assets()
+
+    payload = orjson.dumps(body, option=ORJSON_OPTIONS)
+    # nén một lần cho mỗi phiên bản cache, không nén lại ở mỗi request
+    hit = (
+        payload,
+        gzip.compress(payload, compresslevel=6),
+        hashlib.blake2b(payload, digest_size=8).hexdigest(),
+    )
+
+    with _assets_local_lock:
+        if _assets_local_version == version:
+            _assets_local[key] = hit
+    return hit
 
-        # Tạo STT (index) động — không lưu trong DB
-        out = []
-        for i, a in enumerate(assets, start=1):
-            item = transform_asset_for_frontend(a)
-            item["index"] = i
-            out.append(item)
+def fetch_all_assets():
+    res = supabase.table("assets").select(ASSET_LIST_COLUMNS).order("id", desc=False).execute()
+    # STT (nếu cần) do client đánh theo vị trí dòng, server không gửi.
+    # Dòng vừa decode từ JSON, không ai giữ lại → trả thẳng, không copy từng dict
+    return res.data or []
 
-        return jsonify(out), 200
+def fetch_assets_page():
+    after = int(request.args.get("after_id", 0))
+    limit = min(int(request.args.get("limit", ASSETS_PAGE_SIZE)), ASSETS_PAGE_MAX)
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+
+    res = (
+        supabase.table("assets")
+        .select(ASSET_LIST_COLUMNS)
+        .gt("id", after)
+        .order("id", desc=False)
+        .limit(limit)
+        .execute()
+    )
+    rows = res.data or []
+    next_after = rows[-1]["id"] if len(rows) == limit else None
+
+    return {"items": rows, "next_after": next_after}
+
+# ---- API: count assets ----
+@app.route("/api/assets/count", methods=["GET"])
+def api_count_assets():
+    try:
+        return jsonify({"total": count_assets()}), 200
     except Exception as e:
-        app.logger.error("api_list_assets error: %s", e)
+        app.logger.error("api_count_assets error: %s", e)
         return jsonify({"error": str(e)}), 500
 
+@cache.cached(timeout=ASSETS_CACHE_TIMEOUT, key_prefix="assets_count")
+def count_assets():
+    res = supabase.table("assets").select("id", count="exact").limit(1).execute()
+    return res.count or 0
+
+def invalidate_assets_cache():
+    cache.clear()
+
 # ---- API: add asset ----
 @app.route("/api/assets", methods=["POST"])
 def api_add_asset():
@@ -1295,16 +735,7 @@ def api_add_asset():
 
     try:
 
-        # check trùng mã tài sản
-        if data.get("code"):
-            dup = supabase.table("assets") \
-                .select("code") \
-                .eq("code", data["code"]) \
-                .limit(1) \
-                .execute()
-
-            if dup.data:
-                return jsonify({"error": "Mã tài sản đã tồn tại"}), 400
+        # trùng mã tài sản do unique index assets_code_unique chặn lúc INSERT
 
         # check trùng serial
         if data.get("serial"):
@@ -1322,6 +753,7 @@ def api_add_asset():
 
         ins = supabase.table("assets").insert(data).execute()
         created = ins.data[0]
+        invalidate_assets_cache()
 
         # 🚀 chạy background
         threading.Thread(
@@ -1332,9 +764,97 @@ def api_add_asset():
         return jsonify(transform_asset_for_frontend(created)), 201
 
     except Exception as e:
+        if is_unique_violation(e, "assets_code_unique"):
+            return jsonify({"error": "Mã tài sản đã tồn tại"}), 400
         app.logger.error("api_add_asset error: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# ---- API: bulk add assets ----
+BULK_LOOKUP_BATCH = 200  # giới hạn độ dài URL của in_()
+
+def find_existing_values(column, values):
+    """Return the subset of values already present in assets.<column>."""
+    found = []
+    for start in range(0, len(values), BULK_LOOKUP_BATCH):
+        res = supabase.table("assets") \
+            .select(column) \
+            .in_(column, values[start:start + BULK_LOOKUP_BATCH]) \
+            .execute()
+        found.extend(r[column] for r in (res.data or []))
+    return found
+
+@app.route("/api/assets/bulk", methods=["POST"])
+def api_bulk_add_assets():
+    rows = request.get_json(silent=True)
+    # chấp nhận cả danh sách trần lẫn {"assets": [...]}
+    if isinstance(rows, dict):
+        rows = rows.get("assets")
+
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "Dữ liệu phải là danh sách tài sản"}), 400
+
+    # Bắt buộc phải có serial hoặc invoice (giống api_add_asset)
+    invalid = [
+        i for i, r in enumerate(rows)
+        if not isinstance(r, dict) or (not r.get("serial") and not r.get("invoice_no"))
+    ]
+    if invalid:
+        return jsonify({
+            "error": "Phải nhập Serial hoặc Số invoice",
+            "invalid_rows": invalid
+        }), 400
+
+    codes = [r["code"] for r in rows if r.get("code")]
+    serials = [r["serial"] for r in rows if r.get("serial")]
+
+    if len(set(codes)) != len(codes):
+        return jsonify({"error": "Mã tài sản bị trùng trong danh sách"}), 400
+    if len(set(serials)) != len(serials):
+        return jsonify({"error": "Serial bị trùng trong danh sách"}), 400
+
+    try:
+        dup = find_existing_values("code", codes)
+        if dup:
+            return jsonify({"error": "Mã tài sản đã tồn tại", "duplicates": dup}), 400
+
+        dup = find_existing_values("serial", serials)
+        if dup:
+            return jsonify({"error": "Serial đã tồn tại", "duplicates": dup}), 400
+
+        # Một lệnh INSERT cho cả danh sách = một transaction: lỗi thì không dòng nào được ghi
+        # (body đã bị giới hạn bởi MAX_CONTENT_LENGTH nên không cần chia batch)
+        batch = [normalize_dates(dict(r)) for r in rows]
+        ins = supabase.table("assets").insert(batch).execute()
+        created = ins.data or []
+        invalidate_assets_cache()
+
+        return jsonify({
+            "inserted": len(created),
+            "items": [transform_asset_for_frontend(a) for a in created]
+        }), 201
+
+    except Exception as e:
+        if is_unique_violation(e, "assets_code_unique"):
+            return jsonify({"error": "Mã tài sản đã tồn tại"}), 400
+        app.logger.error("api_bulk_add_assets error: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+# ---- API: lookup asset by serial / CLC / code ----
+@app.route("/api/assets/lookup", methods=["GET"])
+def api_lookup_asset():
+    identifier = (request.args.get("identifier") or "").strip()
+    if not identifier:
+        return jsonify({"error": "Missing identifier"}), 400
+
+    try:
+        asset = find_asset_by_identifier(identifier)
+        if not asset:
+            return jsonify({"error": "Không tìm thấy tài sản"}), 404
+        return jsonify(transform_asset_for_frontend(asset)), 200
+    except Exception as e:
+        app.logger.error("api_lookup_asset error: %s", e)
+        return jsonify({"error": str(e)}), 500
+
 # ---- API: get asset by serial ----
 @app.route("/api/assets/<serial>", methods=["GET"])
 def api_get_asset(serial):
@@ -1349,47 +869,45 @@ def api_get_asset(serial):
         return jsonify({"error": str(e)}), 500
 
 # ---- API UPDATE ASSET ----
+ASSET_UPDATE_FIELDS = frozenset((
+    "clc", "code", "bc_code", "name", "brand", "model", "serial",
+    "location", "status", "import_date", "warranty_end", "description",
+    "declaration_no", "declaration_date", "invoice_no", "invoice_date",
+    "supplier",
+))
+
 @app.route("/api/assets/<int:asset_id>", methods=["PUT", "PATCH"])
 def api_update_asset(asset_id):
     try:
         body = request.get_json() or {}
         body = normalize_dates(body)
 
-        existing = supabase.table("assets").select("*").eq("id", asset_id).single().execute()
-        if not existing.data:
-            return jsonify({"error": "Asset not found"}), 404
-
-        old_asset = existing.data
-
-        allowed_fields = {
-            "clc", "code", "bc_code", "name", "brand", "model", "serial",
-            "location", "status", "import_date", "warranty_end", "description",
-            "declaration_no", "declaration_date", "invoice_no", "invoice_date",
-            "supplier",
-        }
-
-        update_data = {k: v for k, v in body.items() if k in allowed_fields}
+        update_data = {k: v for k, v in body.items() if k in ASSET_UPDATE_FIELDS}
 
         if not update_data:
             return jsonify({"error": "No valid fields to update"}), 400
 
-        if "code" in update_data:
-            new_code = update_data["code"].strip()
-            if new_code != (old_asset.get("code") or ""):
-                dup_check = supabase.table("assets").select("code").eq("code", new_code).execute()
-                if dup_check.data:
-                    return jsonify({"error": "Mã tài sản đã tồn tại"}), 400
+        # trùng mã do unique index assets_code_unique chặn lúc UPDATE;
+        # mã rỗng (tài sản chưa có mã) nằm ngoài index nên không bị coi là trùng
+        if isinstance(update_data.get("code"), str):
+            update_data["code"] = update_data["code"].strip()
 
+        # UPDATE trả về luôn bản ghi mới (RETURNING), rỗng nghĩa là không có asset
         res = (
             supabase.table("assets")
             .update(update_data)
             .eq("id", asset_id)
             .execute()
         )
+        if not res.data:
+            return jsonify({"error": "Asset not found"}), 404
 
+        invalidate_assets_cache()
         return jsonify(res.data[0]), 200
 
     except Exception as e:
+        if is_unique_violation(e, "assets_code_unique"):
+            return jsonify({"error": "Mã tài sản đã tồn tại"}), 400
         app.logger.error("api_update_asset error: %s", e)
         return jsonify({"error": str(e)}), 500
 
@@ -1420,6 +938,7 @@ def api_delete_asset():
 
             supabase.table("asset_files").delete().eq("serial", serial).execute()
             supabase.table("assets").delete().eq("serial", serial).execute()
+            invalidate_assets_cache()
 
             return jsonify({"message": "Đã xóa tài sản theo serial"}), 200
 
@@ -1451,6 +970,7 @@ def api_delete_asset():
 
         # xóa assets
         supabase.table("assets").delete().eq("invoice_no", invoice).execute()
+        invalidate_assets_cache()
 
         return jsonify({
             "message": f"Đã xóa {len(assets.data)} tài sản theo invoice"
@@ -1474,89 +994,129 @@ def api_get_history_by_serial(serial):
         return jsonify({"error": str(e)}), 500
 
 # ---- API add history ----
-@app.route("/api/assets/history", methods=["POST"])
-def api_add_history():
-    body = request.get_json() or {}
+def parse_history_entry(body):
+    """Validate one history payload → (entry without seq, None) or (None, error dict)."""
+    if not isinstance(body, dict):
+        return None, {"error": "Dữ liệu lịch sử không hợp lệ"}
     body = normalize_dates(body)
 
     serial = body.get("serial")
     if not serial:
-        return jsonify({"error": "Missing serial"}), 400
+        return None, {"error": "Missing serial"}
 
     history_type = body.get("type")
-    if history_type not in ("fault", "calib"):
-        return jsonify({"error": "Missing or invalid type"}), 400
+    if history_type not in HISTORY_TYPES:
+        return None, {"error": "Missing or invalid type"}
 
-    try:
-        res = supabase.table("assets").select("serial").eq("serial", serial).limit(1).execute()
-        if not res.data:
-            return jsonify({"error": "Asset not found"}), 404
+    required, build_entry = HISTORY_TYPES[history_type]
 
-        last = (
-            supabase.table("asset_history")
-            .select("seq")
-            .eq("serial", serial)
-            .order("seq", desc=True)
-            .limit(1)
-            .execute()
-        )
-        seq = (last.data[0]["seq"] + 1) if last.data else 1
+    missing = missing_fields(body, required)
+    if missing:
+        return None, {"error": "Thiếu thông tin", "missing_fields": missing}
 
-        entry = {
-            "serial": serial,
-            "type": history_type,
-            "seq": seq
-        }
-
-        if history_type == "fault":
-            entry["fault"] = body.get("fault")
-            entry["fault_date"] = body.get("fault_date")
-            entry["sent_date"] = body.get("sent_date")
-            entry["return_date"] = body.get("return_date")
-
-            missing = [k for k in ("fault", "fault_date") if not entry.get(k)]
-            if missing:
-                return jsonify({"error": "Thiếu thông tin", "missing_fields": missing}), 400
-
-        else:
-            entry["calib_date"] = body.get("calib_date")
-            entry["expire_date"] = body.get("expire_date")
+    entry = build_entry(body)
+    entry["serial"] = serial
+    entry["type"] = history_type
+    return entry, None
 
-            missing = [k for k in ("calib_date", "expire_date") if not entry.get(k)]
-            if missing:
-                return jsonify({"error": "Thiếu thông tin", "missing_fields": missing}), 400
+@app.route("/api/assets/history", methods=["POST"])
+def api_add_history():
+    body = request.get_json(silent=True)
+    # nhận một bản ghi hoặc một danh sách bản ghi
+    many = isinstance(body, list)
+    items = body if many else [body or {}]
+    if not items:
+        return jsonify({"error": "Danh sách lịch sử rỗng"}), 400
+
+    # kiểm tra trước khi gọi DB
+    entries = []
+    for i, item in enumerate(items):
+        entry, err = parse_history_entry(item)
+        if err:
+            if many:
+                err["index"] = i
+            return jsonify(err), 400
+        entries.append(entry)
 
-        ins = supabase.table("asset_history").insert(entry).execute()
+    try:
+        # add_asset_history (Postgres) kiểm tra tài sản, cấp seq và INSERT trong một RPC
+        ins = supabase.rpc("add_asset_history", {"entries": entries}).execute()
 
-        return jsonify(ins.data[0]), 201
+        return jsonify(ins.data if many else ins.data[0]), 201
 
     except Exception as e:
+        if isinstance(e, APIError) and e.code == "P0002":
+            return jsonify({"error": "Asset not found"}), 404
         app.logger.error("api_add_history error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 # ---- EXPORT EXCEL ----
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_SPOOL_MAX_SIZE = 64 * 1024 * 1024  # 64MB
+
+# Header sheet Assets, giống giao diện
+EXPORT_ASSET_HEADERS = (
+    "STT", "Số CLC", "Mã tài sản", "Số tờ khai",
+    "Ngày tờ khai", "Số invoice", "Ngày hóa đơn",
+    "Nhà cung cấp", "Tên máy", "Hãng", "Model",
+    "Mô tả", "Serial", "Vị trí", "Trạng thái",
+    "Ngày nhập", "Hạn bảo hành", "Hiệu lực bảo hành",
+)
+# Thứ tự cột trong file Excel (sau STT, trước "Hiệu lực bảo hành")
+EXPORT_ASSET_COLUMNS = (
+    "clc", "code", "declaration_no", "declaration_date", "invoice_no",
+    "invoice_date", "supplier", "name", "brand", "model", "description",
+    "serial", "location", "status", "import_date", "warranty_end",
+)
+EXPORT_HISTORY_COLUMNS = (
+    "serial", "type", "seq",
+    "fault", "fault_date", "sent_date", "return_date",
+    "calib_date", "expire_date",
+)
+# Lấy cả dòng thành tuple trong một lần gọi (C), không .get() từng ô
+export_asset_row = itemgetter(*EXPORT_ASSET_COLUMNS)
+export_history_row = itemgetter(*EXPORT_HISTORY_COLUMNS)
+
+def fetch_export_history():
+    # theo (serial, seq): khớp index asset_history_serial_seq_idx, không phải sort
+    return (
+        supabase.table("asset_history")
+        .select(",".join(EXPORT_HISTORY_COLUMNS))
+        .order("serial", desc=False)
+        .order("seq", desc=False)
+        .execute()
+    )
+
 @app.route("/export/excel", methods=["GET"])
 def export_excel():
     try:
-        assets = supabase.table("assets").select("*").order("id", desc=False).execute()
-        history = supabase.table("asset_history").select("*").order("seq", desc=False).execute()
+        # Hai truy vấn độc lập → lấy lịch sử song song trong lúc lấy tài sản
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            history_future = pool.submit(fetch_export_history)
+            assets = (
+                supabase.table("assets")
+                .select(",".join(EXPORT_ASSET_COLUMNS))
+                .order("id", desc=False)
+                .execute()
+            )
+            history = history_future.result()
 
-        wb = openpyxl.Workbook()
-        ws1 = wb.active
-        ws1.title = "Assets"
+        # Mỗi request một file riêng: nhỏ thì nằm trong RAM, lớn thì tự tràn ra đĩa
+        tf = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+
+        # constant_memory: mỗi dòng được ghi xuống ngay, không giữ cả sheet trong RAM
+        wb = xlsxwriter.Workbook(tf, {
+            "constant_memory": True,
+            "strings_to_urls": False,
+        })
+        ws1 = wb.add_worksheet("Assets")
 
         # ==== Header GIỐNG GIAO DIỆN ====
-        headers = [
-            "STT", "Số CLC", "Mã tài sản", "Số tờ khai",
-            "Ngày tờ khai", "Số invoice", "Ngày hóa đơn",
-            "Nhà cung cấp", "Tên máy", "Hãng", "Model",
-            "Mô tả", "Serial", "Vị trí", "Trạng thái",
-            "Ngày nhập", "Hạn bảo hành", "Hiệu lực bảo hành"
-        ]
-        ws1.append(headers)
+        ws1.write_row(0, 0, EXPORT_ASSET_HEADERS)
 
         # ==== Ghi từng dòng ====
+        today = date.today()
         for i, a in enumerate(assets.data or [], start=1):
 
             # Tính hiệu lực bảo hành (sửa theo yêu cầu)
@@ -1565,64 +1125,42 @@ def export_excel():
             w_end = a.get("warranty_end")
             if w_end:
                 try:
-                    d = datetime.strptime(w_end, "%Y-%m-%d").date()
-                    if d >= date.today():
+                    # Supabase trả ngày dạng ISO (YYYY-MM-DD) → fromisoformat nhanh hơn strptime
+                    d = date.fromisoformat(w_end)
+                    if d >= today:
                         statusWarranty = "Còn hạn"
                     else:
                         statusWarranty = "Hết hạn"
-                except:
+                except (ValueError, TypeError):
                     # Nếu lỗi format ngày → để rỗng luôn
                     statusWarranty = ""
             else:
                 # Không có ngày bảo hành → để rỗng
                 statusWarranty = ""
 
-            ws1.append([
-                i,
-                a.get("clc", ""),
-                a.get("code", ""),
-                a.get("declaration_no", ""),
-                a.get("declaration_date", ""),
-                a.get("invoice_no", ""),
-                a.get("invoice_date", ""),
-                a.get("supplier", ""),
-                a.get("name", ""),
-                a.get("brand", ""),
-                a.get("model", ""),
-                a.get("description", ""),
-                a.get("serial", ""),
-                a.get("location", ""),
-                a.get("status", ""),
-                a.get("import_date", ""),
-                a.get("warranty_end", ""),
-                statusWarranty
-            ])
+            ws1.write_row(i, 0, (i, *export_asset_row(a), statusWarranty))
 
 
         # ==== Sheet lịch sử =====
-        ws2 = wb.create_sheet("History")
-        ws2.append([
-            'serial', 'type', 'seq',
-            'fault', 'fault_date', 'sent_date', 'return_date',
-            'calib_date', 'expire_date'
-        ])
-
-        for h in (history.data or []):
-            ws2.append([
-                h.get("serial", ""),
-                h.get("type", ""),
-                h.get("seq", ""),
-                h.get("fault", ""),
-                h.get("fault_date", ""),
-                h.get("sent_date", ""),
-                h.get("return_date", ""),
-                h.get("calib_date", ""),
-                h.get("expire_date", "")
-            ])
-
-        fp = tempfile.gettempdir() + "/assets_export.xlsx"
-        wb.save(fp)
-        return send_file(fp, as_attachment=True, download_name="assets.xlsx")
+        ws2 = wb.add_worksheet("History")
+        ws2.write_row(0, 0, EXPORT_HISTORY_COLUMNS)
+
+        for r, h in enumerate(history.data or [], start=1):
+            ws2.write_row(r, 0, export_history_row(h))
+
+        wb.close()
+        # werkzeug chỉ tự biết độ dài với BytesIO → tự đo để gửi Content-Length
+        size = tf.seek(0, os.SEEK_END)
+        tf.seek(0)
+        resp = send_file(
+            tf,
+            as_attachment=True,
+            download_name="assets.xlsx",
+            mimetype=XLSX_MIMETYPE,
+            conditional=True
+        )
+        resp.content_length = size
+        return resp
 
     except Exception as e:
         app.logger.error("export_excel error: %s", e)
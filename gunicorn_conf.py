@@ -0,0 +1,14 @@
+# gunicorn_conf.py
+# Chạy production: gunicorn -c gunicorn_conf.py wsgi:app
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# App chủ yếu chờ I/O (Supabase) → gevent: mỗi worker giữ nhiều request cùng lúc
+# trong lúc chờ mạng. Chỉnh số worker bằng WEB_CONCURRENCY.
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gevent"
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+keepalive = 5
+timeout = 60
@@ -1,31 +1,37 @@
-import time
-import requests
+# keepalive.py
+# Ping app một lần rồi thoát — chạy bằng cron/systemd timer hoặc dịch vụ ping ngoài
+# (UptimeRobot, cron-job.org), không giữ process Python chạy suốt ngày.
+#
+# Cron (mỗi 5 phút, 08:00–16:55 giờ VN):
+#   CRON_TZ=Asia/Ho_Chi_Minh
+#   */5 8-16 * * * /usr/bin/python3 /path/to/keepalive.py
+
 from datetime import datetime
-import pytz
+from urllib.request import urlopen
+from zoneinfo import ZoneInfo
 
 # URL bạn muốn ping
 PING_URL = "https://factory-assets-manager.onrender.com"
 
 # múi giờ VN
-tz = pytz.timezone("Asia/Ho_Chi_Minh")
+tz = ZoneInfo("Asia/Ho_Chi_Minh")
+
 
-while True:
+def main():
     now = datetime.now(tz)
-    hour = now.hour
-
-    # Chỉ ping từ 08:00 đến 17:00
-    if 8 <= hour < 17:
-        print(f"[{now}] Sending ping to {PING_URL}...")
-        try:
-            res = requests.get(PING_URL, timeout=15)
-            print("Status:", res.status_code)
-        except Exception as e:
-            print("Error:", e)
-
-        # chờ 5 phút giữa các ping
-        time.sleep(300)  # 300s = 5 phút
-
-    else:
-        # Không trong giờ làm → ngủ dài
-        print(f"[{now}] Ngoài giờ 08–17 → không ping. Ngủ 30 phút.")
-        time.sleep(1800)  # 30 phút
+
+    # Chỉ ping từ 08:00 đến 17:00 (phòng khi lịch chạy không giới hạn giờ)
+    if not 8 <= now.hour < 17:
+        print(f"[{now}] Ngoài giờ 08–17 → không ping.")
+        return
+
+    print(f"[{now}] Sending ping to {PING_URL}...")
+    try:
+        with urlopen(PING_URL, timeout=15) as res:
+            print("Status:", res.status)
+    except Exception as e:
+        print("Error:", e)
+
+
+if __name__ == "__main__":
+    main()
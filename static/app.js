@@ -0,0 +1,1070 @@
+const addModal = new bootstrap.Modal(document.getElementById('modalAdd'));
+const editModal = new bootstrap.Modal(document.getElementById('modalEdit'));
+const delModal = new bootstrap.Modal(document.getElementById('modalDelete'));
+const histModal = new bootstrap.Modal(document.getElementById('modalHist'));
+
+let hist_target_identifier = null; // will store the identifier (could be clc, code, or serial)
+let assetCache = [];
+const histCache = new Map(); // serial → lịch sử đã tải
+
+function openAdd(){
+
+  document.getElementById('addAlert').classList.add('d-none');
+
+  document.getElementById('add_declaration_date').value='';
+  document.getElementById('add_invoice_date').value='';
+  document.getElementById('add_import').value='';
+  document.getElementById('add_warranty').value='';
+
+  addModal.show();
+}
+function openEdit(){ document.getElementById('editAlert').classList.add('d-none'); editModal.show(); }
+function openDelete(){ resetDeleteModal(); delModal.show(); }
+function openHist(){ document.getElementById('histAlert').classList.add('d-none'); document.getElementById('hist_found').innerText=''; hist_target_identifier = null; histModal.show(); }
+
+function updateFilteredAssets(){
+  const table = document.getElementById('assetTable');
+  const rows = table.tBodies[0].rows;
+
+  // dòng chưa vẽ chỉ có khi không lọc (applyFilters vẽ hết) → đều được tính
+  let count = viewList.length - renderedCount;
+  for (const r of rows){
+    if (!r.classList.contains("history-row") && r.style.display !== "none") {
+      count++;
+    }
+  }
+
+  document.getElementById("filteredAssets").innerText =
+      "Số tài sản đang được lọc: " + count;
+}
+
+const PAGE_SIZE = 200;
+let loadTableGen = 0;
+
+// Chỉ vẽ phần đầu bảng, cuộn tới cuối thì vẽ thêm (DOM không phình theo số tài sản)
+const RENDER_CHUNK = 100;
+let viewList = [];      // danh sách đang hiển thị (theo thứ tự sort), có thể chưa vẽ hết
+let renderedCount = 0;  // số dòng đầu của viewList đã có trong tbody
+let moreObserver = null;
+
+// Gộp các GET giống nhau trong thời gian ngắn thành một request
+const inflight = new Map(); // url → {p, t}
+
+function cachedFetch(url, ttl = 2000){
+  const now = Date.now();
+  const c = inflight.get(url);
+  if(c && now - c.t < ttl) return c.p;
+
+  const p = fetch(url)
+    .then(async r => ({ok: r.ok, data: await r.json()}))
+    .then(r => { if(!r.ok) inflight.delete(url); return r; },
+          e => { inflight.delete(url); throw e; });
+  inflight.set(url, {p, t: now});
+  return p;
+}
+
+function invalidateFetchCache(){
+  inflight.clear();
+}
+
+async function loadTable(){
+  // tải theo từng trang, vẽ dần từng đợt
+  const gen = ++loadTableGen;
+  const tbody = document.querySelector("#assetTable tbody");
+  tbody.innerHTML = "";
+  assetCache = [];
+  viewList = [];
+  renderedCount = 0;
+  loadTotalAssets();  // tổng số lấy riêng, không chờ tải hết các trang
+
+  let after = 0;
+  while(after !== null){
+    const {ok, data: page} = await cachedFetch(`/api/assets?after_id=${after}&limit=${PAGE_SIZE}`);
+    if(gen !== loadTableGen) return;  // đã có lần tải mới hơn
+    if(!ok) break;
+
+    assetCache.push(...page.items);
+    if(activeSort){
+      // đang sort → sắp lại cả danh sách cùng trang mới, không nối trang vào cuối
+      renderTable(sortedAssets());
+    } else {
+      viewList.push(...page.items);
+      // trang đầu vẽ ngay; các trang sau chỉ vẽ nếu đang cuộn ở cuối bảng
+      if(renderedCount < RENDER_CHUNK) renderMore();
+      else recheckSentinel();
+    }
+    after = page.next_after;
+  }
+  updateTotalAssets();
+  updateFilteredAssets();
+}
+
+let serverTotal = null;  // tổng số từ /api/assets/count, null = chưa có / lỗi
+
+async function loadTotalAssets(){
+  const {ok, data} = await cachedFetch("/api/assets/count");
+  serverTotal = ok ? data.total : null;
+  updateTotalAssets();
+}
+
+function updateTotalAssets(){
+  // số của server là chuẩn; assetCache chỉ dùng khi chưa lấy được (có thể thiếu trang)
+  const total = serverTotal !== null ? serverTotal : assetCache.length;
+  document.getElementById("totalAssets").innerText =
+      "Tổng số tài sản: " + total;
+}
+
+function renderTable(list){
+  const tbody = document.querySelector("#assetTable tbody");
+  tbody.innerHTML = "";
+  viewList = list;
+  renderedCount = 0;
+  renderMore();
+}
+
+// vẽ thêm một đoạn của viewList
+function renderMore(){
+  const end = Math.min(renderedCount + RENDER_CHUNK, viewList.length);
+  if(end <= renderedCount) return;
+  const tbody = document.querySelector("#assetTable tbody");
+  tbody.appendChild(renderRows(viewList.slice(renderedCount, end)));
+  renderedCount = end;
+  if(filtersActive()) applyFilters();
+  recheckSentinel();
+}
+
+// vẽ nốt mọi dòng còn lại (khi lọc cần đủ dòng trong DOM)
+function renderAll(){
+  if(renderedCount >= viewList.length) return;
+  const tbody = document.querySelector("#assetTable tbody");
+  tbody.appendChild(renderRows(viewList.slice(renderedCount)));
+  renderedCount = viewList.length;
+}
+
+// observe lại → observer báo ngay trạng thái hiện tại; sentinel còn trong tầm nhìn thì vẽ tiếp
+function recheckSentinel(){
+  if(!moreObserver){ renderAll(); return; }  // trình duyệt không có IntersectionObserver
+  const sentinel = document.getElementById("rowsSentinel");
+  moreObserver.unobserve(sentinel);
+  moreObserver.observe(sentinel);
+}
+
+function initLazyRows(){
+  if(!("IntersectionObserver" in window)) return;
+  const sentinel = document.getElementById("rowsSentinel");
+  moreObserver = new IntersectionObserver(entries => {
+    if(entries.some(e => e.isIntersecting)) renderMore();
+  }, {root: sentinel.closest(".table-scroll"), rootMargin: "300px"});
+  moreObserver.observe(sentinel);
+}
+
+function removeFromView(id){
+  const i = viewList.findIndex(x => x.id == id);
+  if(i === -1) return;
+  viewList.splice(i, 1);
+  if(i < renderedCount) renderedCount--;
+}
+
+// dựng cả loạt dòng ngoài DOM, gắn vào bảng một lần (một lần reflow)
+function renderRows(list){
+  const frag = document.createDocumentFragment();
+  for(const a of list){
+    frag.appendChild(renderRow(a));
+  }
+  return frag;
+}
+
+// một listener cho cả tbody thay vì mỗi dòng một listener
+function initRowClicks(){
+  const tbody = document.querySelector("#assetTable tbody");
+  tbody.addEventListener("click", function(e){
+    // tránh click vào icon / button bên trong history
+    if(e.target.closest("span")) return;
+    if(e.target.tagName === "BUTTON") return;
+    const tr = e.target.closest("tr");
+    // chỉ dòng tài sản (có data-id), bỏ qua dòng lịch sử và bảng con
+    if(!tr || !tr.dataset.id) return;
+    toggleHistory(tr, tr.dataset.serial);
+  });
+}
+
+function renderRow(a){
+  const tr = document.createElement("tr");
+  tr.style.cursor = "pointer";
+
+  tr.dataset.id = a.id;
+  tr.dataset.serial = a.serial || "";
+
+  // Tính hiệu lực bảo hành
+  let statusWarranty = "";
+  const today = new Date();
+
+  if (a.warranty_end) {
+    const d = new Date(a.warranty_end);
+
+    if (!isNaN(d.getTime())) {
+      // Có giá trị hợp lệ
+      statusWarranty = d >= today ? "Còn hạn" : "Hết hạn";
+    } else {
+      // Không parse được ngày → để rỗng
+      statusWarranty = "";
+    }
+  } else {
+    // Không có ngày bảo hành → để rỗng
+    statusWarranty = "";
+  }
+
+
+  tr.innerHTML = `
+    <td style="text-align:center;white-space:nowrap">
+
+      <span style="cursor:pointer;font-size:16px;margin-right:6px"
+        onclick="openEditFromRow(${a.id})">🔧</span>
+      <span style="cursor:pointer;font-size:16px";margin-right:6px"
+        onclick="openHistoryFromRow(${a.id})">📘</span>
+      <span style="cursor:pointer;font-size:16px;color:#dc3545"
+        onclick="deleteAssetFromRow(${a.id})">🗑️</span>
+
+    </td>
+
+    <td>${esc(a.clc)}</td>
+    <td>${esc(a.code)}</td>
+    <td>${esc(a.bc_code)}</td>
+    <td>${esc(a.declaration_no)}</td>
+    <td>${esc(a.declaration_date)}</td>
+    <td>${esc(a.invoice_no)}</td>
+    <td>${esc(a.invoice_date)}</td>
+    <td>${esc(a.supplier)}</td>
+    <td>${esc(a.name)}</td>
+    <td>${esc(a.brand)}</td>
+    <td>${esc(a.model)}</td>
+    <td>${esc(a.description)}</td>
+    <td>${esc(a.serial)}</td>
+    <td>${esc(a.location)}</td>
+    <td>${esc(a.status)}</td>
+    <td>${esc(a.import_date)}</td>
+    <td>${esc(a.warranty_end)}</td>
+    <td style="font-weight:600; color:${statusWarranty === "Còn hạn" ? "green" : "red"}">${statusWarranty}</td>
+  `;
+
+  return tr;
+}
+
+function updateRowById(id, updated){
+
+  // dòng chưa vẽ → lúc vẽ sẽ dùng bản mới
+  const i = viewList.findIndex(x => x.id == id);
+  if(i !== -1) viewList[i] = updated;
+
+  const tr = document.querySelector(`#assetTable tr[data-id="${id}"]`);
+
+  if(!tr) return;
+
+  const newRow = renderRow(updated);
+
+  tr.innerHTML = newRow.innerHTML;
+
+  // update dataset
+  tr.dataset.serial = updated.serial || "";
+}
+
+function appendRow(a){
+  viewList.push(a);
+  // còn dòng chưa vẽ → dòng mới (ở cuối) sẽ được vẽ khi cuộn tới
+  if(renderedCount < viewList.length - 1) return;
+  const tbody = document.querySelector("#assetTable tbody");
+  tbody.appendChild(renderRow(a));
+  renderedCount = viewList.length;
+}
+
+
+function getFilters(){
+  const table = document.getElementById('assetTable');
+  return Array.from(table.tHead.rows[1].querySelectorAll('input')).map(i=>i.value.trim().toLowerCase());
+}
+
+function filtersActive(){
+  return getFilters().some(f => f);
+}
+
+function applyFilters(){
+  const table = document.getElementById('assetTable');
+  const filters = getFilters();
+  // đang lọc → cần đủ mọi dòng trong DOM
+  if(filters.some(f => f)) renderAll();
+  const rows = table.tBodies[0].rows;
+  for(const r of rows){
+    if(r.classList && r.classList.contains('history-row')) continue;
+    let visible = true;
+    for(let c=0;c<filters.length;c++){
+      if(!filters[c]) continue;
+      const cell = r.cells[c];
+      if(!cell || cell.textContent.toLowerCase().indexOf(filters[c]) === -1){ visible = false; break; }
+    }
+    r.style.display = visible ? '' : 'none';
+    const next = r.nextSibling;
+    if(next && next.classList && next.classList.contains('history-row')) next.style.display = visible ? '' : 'none';
+  }
+  updateFilteredAssets();
+}
+
+let sortState = {}; // lưu trạng thái sort từng cột
+let activeSort = null; // {field, state} của lần sort đang áp dụng, null = thứ tự gốc
+
+function updateSortIcons(columnIndex, state) {
+  const icons = document.querySelectorAll("#assetTable thead tr:first-child th .sort-icon");
+  icons.forEach(i => {
+    i.classList.remove("active");
+    i.textContent = "↕"; // reset
+  });
+
+  const currentIcon = document.querySelector(`#assetTable thead tr:first-child th:nth-child(${columnIndex + 1}) .sort-icon`);
+  if (!currentIcon) return;
+
+  if (state === "asc") {
+    currentIcon.textContent = "A↓Z";
+    currentIcon.classList.add("active");
+  }
+  else if (state === "desc") {
+    currentIcon.textContent = "Z↑A";
+    currentIcon.classList.add("active");
+  }
+}
+
+const columnMap = [
+  "clc",
+  "code",
+  "bc_code",
+  "declaration_no",
+  "declaration_date",
+  "invoice_no",
+  "invoice_date",
+  "supplier",
+  "name",
+  "brand",
+  "model",
+  "description",
+  "serial",
+  "location",
+  "status",
+  "import_date",
+  "warranty_end",
+  null
+];
+
+function sortTable(columnIndex) {
+  const field = columnMap[columnIndex];
+  if (!field) return; // cột không sort
+
+  const state = sortState[columnIndex] || "none";
+  const newState = state === "none" ? "asc" : state === "asc" ? "desc" : "none";
+  sortState[columnIndex] = newState;
+
+  updateSortIcons(columnIndex, newState);
+
+  activeSort = newState === "none" ? null : {field, state: newState};
+
+  renderTable(sortedAssets());
+  applyFilters();
+  updateFilteredAssets();
+}
+
+// assetCache theo cột đang sort (bản copy, không đổi assetCache)
+function sortedAssets(){
+  const data = [...assetCache];
+  if (!activeSort) return data;
+  const {field, state: newState} = activeSort;
+
+  data.sort((a, b) => {
+    const valA = a[field] || "";
+    const valB = b[field] || "";
+
+    // Ngày → sort đúng dạng date
+    if (field === "import_date" || field === "warranty_end") {
+      return newState === "asc"
+        ? new Date(valA) - new Date(valB)
+        : new Date(valB) - new Date(valA);
+    }
+
+    // Mặc định A-Z
+    return newState === "asc"
+      ? String(valA).localeCompare(String(valB), "vi")
+      : String(valB).localeCompare(String(valA), "vi");
+  });
+  return data;
+}
+
+
+function initSorting() {
+  const headers = document.querySelectorAll("#assetTable thead tr:first-child th.sortable");
+  headers.forEach((th, index) => {
+    th.addEventListener("click", () => sortTable(index));
+  });
+}
+
+function formatFileSize(bytes) {
+  if (!bytes) return "";
+  const kb = bytes / 1024;
+  if (kb < 1024) return kb.toFixed(1) + " KB";
+  return (kb / 1024).toFixed(2) + " MB";
+}
+
+function openEditFromRow(id){
+
+  const a = assetCache.find(x => x.id === id);
+  if(!a){
+    alert("Không tìm thấy asset");
+    return;
+  }
+  document.getElementById('edit_serial').dataset.assetId = id;
+
+  if(!a){
+    alert("Không tìm thấy asset");
+    return;
+  }
+
+  document.getElementById('edit_code').value = a.code || '';
+  document.getElementById('edit_bc_code').value = a.bc_code || '';
+  document.getElementById('edit_clc').value = a.clc || '';
+  document.getElementById('edit_name').value = a.name || '';
+  document.getElementById('edit_brand').value = a.brand || '';
+  document.getElementById('edit_model').value = a.model || '';
+  document.getElementById('edit_serial').value = a.serial || '';
+  document.getElementById('edit_location').value = a.location || '';
+  document.getElementById('edit_status').value = a.status || '';
+  document.getElementById('edit_import').value = a.import_date || '';
+  document.getElementById('edit_warranty').value = a.warranty_end || '';
+  document.getElementById('edit_description').value = a.description || '';
+  document.getElementById('edit_invoice_no').value = a.invoice_no || '';
+  document.getElementById('edit_declaration_no').value = a.declaration_no || '';
+  document.getElementById('edit_supplier').value = a.supplier || '';
+  document.getElementById('edit_declaration_date').value = a.declaration_date || '';
+  document.getElementById('edit_invoice_date').value = a.invoice_date || '';
+
+  document.getElementById('editForm').style.display = 'block';
+
+  editModal.show();
+}
+
+function openHistoryFromRow(id){
+
+  const a = assetCache.find(x => x.id == id);
+
+  if(!a){
+    alert("Không tìm thấy asset");
+    return;
+  }
+
+  // dùng serial làm identifier cho history
+  hist_target_identifier = a.serial;
+
+  if(!a.serial){
+    alert("Tài sản này chưa có serial nên chưa thể thêm lịch sử.");
+    return;
+  }
+
+  document.getElementById("hist_lookup").value = a.serial;
+
+  document.getElementById("hist_found").innerText =
+    `Serial: ${a.serial} | Tên: ${a.name || ""} | CLC: ${a.clc || ""}`;
+
+  document.getElementById("histAlert").classList.add("d-none");
+
+  histModal.show();
+}
+
+async function deleteAssetFromRow(id){
+
+  const a = assetCache.find(x => x.id == id);
+
+  if(!a){
+    alert("Không tìm thấy asset");
+    return;
+  }
+
+  const msg =
+    "Bạn có chắc muốn xóa tài sản:\n\n" +
+    "Mã tài sản: " + (a.code || "") + "\n" +
+    "Số invoice: " + (a.invoice_no || "") + "\n" +
+    "Serial: " + (a.serial || "") + "\n";
+
+  if(!confirm(msg)) return;
+
+  let url = "/api/assets/delete?";
+
+  if(a.serial){
+    url += "serial=" + encodeURIComponent(a.serial);
+  }else if(a.invoice_no){
+    url += "invoice=" + encodeURIComponent(a.invoice_no);
+  }else{
+    alert("Không xác định được asset để xóa");
+    return;
+  }
+
+  const res = await fetch(url,{method:'DELETE'});
+  const data = await res.json();
+
+  if(!res.ok){
+    alert(data.error || "Xóa thất bại");
+    return;
+  }
+  invalidateFetchCache();
+
+  // Xóa khỏi cache
+  assetCache = assetCache.filter(x => x.id != id);
+  removeFromView(id);
+
+  // Xóa row khỏi table
+  const tr = document.querySelector(`#assetTable tr[data-id="${id}"]`);
+  if(tr) tr.remove();
+
+  loadTotalAssets();  // đếm lại ở server (cache đã bị xóa sau khi xóa tài sản)
+  updateFilteredAssets();
+
+  alert("Đã xóa tài sản");
+}
+
+async function doAdd(){
+  const payload = {
+    clc: document.getElementById('add_clc').value.trim(),
+    code: document.getElementById('add_code').value.trim(),
+    bc_code: document.getElementById('add_bc_code').value.trim(),
+    declaration_no: document.getElementById('add_declaration_no').value.trim(),
+    declaration_date: document.getElementById('add_declaration_date').value,
+    invoice_no: document.getElementById('add_invoice_no').value.trim(),
+    invoice_date: document.getElementById('add_invoice_date').value,
+    supplier: document.getElementById('add_supplier').value.trim(),
+    name: document.getElementById('add_name').value.trim(),
+    brand: document.getElementById('add_brand').value.trim(),
+    model: document.getElementById('add_model').value.trim(),
+    serial: document.getElementById('add_serial').value.trim(),
+    location: document.getElementById('add_location').value.trim(),
+    status: document.getElementById('add_status').value,
+    import_date: document.getElementById('add_import').value,
+    warranty_end: document.getElementById('add_warranty').value,
+    description: document.getElementById('add_description').value.trim()
+  };
+  const res = await fetch('/api/assets', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(payload)});
+  const data = await res.json();
+  if(!res.ok){
+    const el = document.getElementById('addAlert'); el.classList.remove('d-none');
+    if(data.missing_fields) el.innerText = data.error + ': ' + data.missing_fields.join(', '); else el.innerText = data.error || 'Có lỗi';
+    return;
+  }
+  invalidateFetchCache();
+  appendRow(data);     // thêm dòng mới
+  assetCache.push(data);  // cập nhật cache
+  loadTotalAssets();  // đếm lại ở server
+  addModal.hide();
+  ['add_clc','add_code','add_name','add_brand','add_model','add_serial','add_location',
+  'add_import','add_warranty','add_description',
+  'add_declaration_date','add_invoice_date']
+  .forEach(id=>document.getElementById(id).value='');
+}
+
+
+async function doEdit() {
+
+  const assetId = document.getElementById('edit_serial').dataset.assetId;
+
+  const payload = {
+    clc: document.getElementById('edit_clc').value.trim(),
+    code: document.getElementById('edit_code').value.trim(),
+    bc_code: document.getElementById('edit_bc_code').value.trim(),
+    declaration_no: document.getElementById('edit_declaration_no').value.trim(),
+    declaration_date: document.getElementById('edit_declaration_date').value,
+    invoice_no: document.getElementById('edit_invoice_no').value.trim(),
+    invoice_date: document.getElementById('edit_invoice_date').value,
+    supplier: document.getElementById('edit_supplier').value.trim(),
+    name: document.getElementById('edit_name').value.trim(),
+    brand: document.getElementById('edit_brand').value.trim(),
+    model: document.getElementById('edit_model').value.trim(),
+    serial: document.getElementById('edit_serial').value.trim(),
+    location: document.getElementById('edit_location').value.trim(),
+    status: document.getElementById('edit_status').value,
+    import_date: document.getElementById('edit_import').value,
+    warranty_end: document.getElementById('edit_warranty').value,
+    description: document.getElementById('edit_description').value.trim()
+  };
+
+  const res = await fetch('/api/assets/' + assetId, {
+    method:'PUT',
+    headers:{'Content-Type':'application/json'},
+    body: JSON.stringify(payload)
+  });
+
+  const data = await res.json();
+
+  if (!res.ok) {
+    const alert = document.getElementById('editAlert');
+    alert.classList.remove('d-none');
+    alert.innerText = data.error || "Có lỗi khi cập nhật";
+    return;
+  }
+
+  invalidateFetchCache();
+  updateRowById(assetId, data);
+
+  const idx = assetCache.findIndex(a => a.id == assetId);
+  if (idx !== -1) assetCache[idx] = data;
+
+  editModal.hide();
+
+  document.getElementById('edit_declaration_date').value='';
+  document.getElementById('edit_invoice_date').value='';
+  document.getElementById('edit_import').value='';
+  document.getElementById('edit_warranty').value='';
+}
+
+
+let pendingDeleteUrl = null;
+
+function showDeleteError(msg){
+  const el = document.getElementById('delAlert');
+  el.innerText = msg;
+  el.classList.remove('d-none');
+}
+
+function resetDeleteModal(){
+  pendingDeleteUrl = null;
+  document.getElementById('delAlert').classList.add('d-none');
+  document.getElementById('delConfirm').classList.add('d-none');
+}
+
+function doDelete(){
+
+  resetDeleteModal();
+
+  const serial = document.getElementById('del_serial').value.trim();
+  const invoice = document.getElementById('del_invoice').value.trim();
+
+  if(!serial && !invoice){
+    showDeleteError("Nhập Serial hoặc Số invoice để xóa");
+    return;
+  }
+
+  let url = "/api/assets/delete?";
+  let target;
+  if(serial){
+    url += "serial=" + encodeURIComponent(serial);
+    target = "tài sản có Serial " + serial;
+  }
+  else{
+    url += "invoice=" + encodeURIComponent(invoice);
+    target = "mọi tài sản thuộc invoice " + invoice;
+  }
+
+  // chuyển sang bước xác nhận; sửa ô nhập sẽ hủy bước này (resetDeleteModal)
+  pendingDeleteUrl = url;
+  document.getElementById('delConfirmText').innerText =
+      "Bạn có chắc muốn xóa " + target + "?";
+  document.getElementById('delConfirm').classList.remove('d-none');
+}
+
+function cancelDelete(){
+  resetDeleteModal();
+}
+
+async function confirmDelete(){
+
+  const url = pendingDeleteUrl;
+  if(!url) return;
+  resetDeleteModal();
+
+  const res = await fetch(url,{
+    method:'DELETE'
+  });
+
+  const data = await res.json();
+
+  if(!res.ok){
+    showDeleteError(data.error || "Có lỗi khi xóa");
+    return;
+  }
+
+  invalidateFetchCache();
+
+  delModal.hide();
+  loadTable();
+
+  document.getElementById('del_serial').value = "";
+  document.getElementById('del_invoice').value = "";
+}
+
+// lookup asset by CLC or Serial for history modal
+let lookupTimer = null;
+let lookupAbort = null;
+
+// gõ phím → chờ 250ms mới tìm
+function scheduleLookup(){
+  clearTimeout(lookupTimer);
+  // nội dung đã đổi → bỏ kết quả cũ ngay, tránh lưu lịch sử nhầm tài sản
+  hist_target_identifier = null;
+  document.getElementById('hist_found').innerText = '';
+  lookupTimer = setTimeout(lookupAssetForHist, 250);
+}
+
+async function lookupAssetForHist() {
+  // hủy lần tìm đang chờ / đang chạy
+  clearTimeout(lookupTimer);
+  if (lookupAbort) lookupAbort.abort();
+  lookupAbort = new AbortController();
+  const signal = lookupAbort.signal;
+
+  const v = document.getElementById('hist_lookup').value.trim();
+  const el = document.getElementById('hist_found'); 
+  el.innerText = '';
+  // chỉ gán lại khi lần tìm này trả về tài sản
+  hist_target_identifier = null;
+
+  if (!v) {
+    el.innerText = 'Nhập Số CLC hoặc Serial để tìm';
+    return;
+  }
+
+  // Tìm theo serial hoặc CLC ở server, chỉ nhận về 1 dòng
+  let res, found;
+  try {
+    res = await fetch('/api/assets/lookup?identifier=' + encodeURIComponent(v), {signal});
+    found = await res.json();
+  } catch (e) {
+    if (e.name === 'AbortError') return;  // đã có lần tìm mới hơn
+    throw e;
+  }
+
+  if (!res.ok) {
+    el.innerText = 'Không tìm thấy tài sản';
+    hist_target_identifier = null;
+    return;
+  }
+
+  // Quan trọng: chỉ lấy serial
+  hist_target_identifier = found.serial;
+
+  el.innerText = `Tìm thấy: Serial=${found.serial}, Tên=${found.name}, CLC=${found.clc || ''}`;
+}
+
+
+function onHistTypeChange(){
+  const t = document.getElementById('hist_type').value;
+  document.getElementById('hist_fault_form').style.display = t === 'fault' ? 'block' : 'none';
+  document.getElementById('hist_calib_form').style.display = t === 'calib' ? 'block' : 'none';
+}
+
+function openGuide(){
+  document.getElementById("guideOverlay").style.display="flex";
+}
+
+function closeGuide(){
+  document.getElementById("guideOverlay").style.display="none";
+}
+
+function showGuide(type){
+
+  const images = {
+    add: "/static/guide_add.png",
+    edit: "/static/guide_edit.png",
+    history: "/static/guides_history.png",
+    delete: "/static/guide_delete.png"
+  };
+
+  document.getElementById("guideOverlay").style.display="none";
+
+  const img = document.getElementById("guideImage");
+  img.src = images[type];
+
+  document.getElementById("guideImageOverlay").style.display="flex";
+}
+
+function closeGuideImage(){
+  document.getElementById("guideImageOverlay").style.display="none";
+}
+
+async function doAddHistory(){
+  if(!hist_target_identifier){
+    const el = document.getElementById('histAlert'); 
+    el.classList.remove('d-none'); 
+    el.innerText = 'Bạn phải tìm và chọn tài sản bằng Serial hoặc CLC trước.';
+    return;
+  }
+
+  const type = document.getElementById('hist_type').value;
+
+  let payload = { 
+    serial: hist_target_identifier, 
+    type 
+  };
+
+  if(type === 'fault'){
+    payload.fault = document.getElementById('hist_fault').value.trim();
+    payload.fault_date = document.getElementById('hist_fault_date').value;
+    payload.sent_date = document.getElementById('hist_sent').value;
+    payload.return_date = document.getElementById('hist_return').value || '';
+  } 
+  else {
+    payload.calib_date = document.getElementById('hist_calib_date').value;
+    payload.expire_date = document.getElementById('hist_expire_date').value;
+  }
+
+  const res = await fetch('/api/assets/history', {
+    method:'POST', 
+    headers:{'Content-Type':'application/json'}, 
+    body: JSON.stringify(payload)
+  });
+
+  const data = await res.json();
+
+  if(!res.ok){
+    const el = document.getElementById('histAlert'); 
+    el.classList.remove('d-none'); 
+    
+    if(data.missing_fields)
+      el.innerText = data.error + ': ' + data.missing_fields.join(', ');
+    else 
+      el.innerText = data.error || 'Có lỗi';
+
+    return;
+  }
+
+  histCache.delete(hist_target_identifier);
+  invalidateFetchCache();
+  histModal.hide(); 
+  loadTable();
+
+  ['hist_lookup','hist_fault','hist_fault_date','hist_sent','hist_return','hist_calib_date','hist_expire_date']
+    .forEach(id => document.getElementById(id).value='');
+
+  hist_target_identifier = null;
+}
+
+// escape HTML cho dữ liệu người dùng nhập
+const ESC_MAP = {'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'};
+function esc(v){
+  return String(v ?? '').replace(/[&<>"']/g, c => ESC_MAP[c]);
+}
+
+function makeEl(tag, text){
+  const el = document.createElement(tag);
+  el.textContent = text;
+  return el;
+}
+
+function emptyNote(){
+  const div = document.createElement('div');
+  div.appendChild(makeEl('em', 'Không có'));
+  return div;
+}
+
+function buildHistoryTable(headers, rows){
+  const table = document.createElement('table');
+  table.className = 'table table-sm';
+
+  const head = table.createTHead().insertRow();
+  for(const h of headers) head.appendChild(makeEl('th', h));
+
+  const tbody = table.createTBody();
+  for(const r of rows){
+    const tr = tbody.insertRow();
+    for(const v of r) tr.insertCell().textContent = v ?? '';
+  }
+  return table;
+}
+
+let historyLoading = {};
+
+async function toggleHistory(row, serial){
+
+  if(historyLoading[serial]) return;
+  historyLoading[serial] = true;
+
+  let next = row.nextSibling;
+
+  // nếu đang mở → đóng
+  if(next && next.classList && next.classList.contains('history-row')){
+    next.remove();
+    historyLoading[serial] = false;
+    return;
+  }
+
+  // file đính kèm tải song song với lịch sử
+  const filesPromise = renderFiles(serial);
+
+  // mở lại dòng đã xem → dùng lịch sử đã tải, không gọi lại server
+  let data = histCache.get(serial);
+  if(!data){
+    const res = await fetch('/api/assets/history/' + encodeURIComponent(serial));
+    data = await res.json();
+    if(res.ok) histCache.set(serial, data);
+  }
+
+  const tr = document.createElement('tr');
+  tr.classList.add('history-row');
+
+  const td = document.createElement('td');
+  td.colSpan = 12;
+
+  // render history: dựng DOM tách rời trong fragment, gắn vào một lần
+  const frag = document.createDocumentFragment();
+
+  if(data.error || data.length === 0){
+    frag.appendChild(makeEl('em', 'Chưa có lịch sử'));
+  } else {
+    const faults = data.filter(h => h.type === 'fault');
+    const calibs = data.filter(h => h.type === 'calib');
+
+    frag.appendChild(makeEl('h6', 'Lịch sử lỗi'));
+    frag.appendChild(faults.length
+      ? buildHistoryTable(
+          ['Seq', 'Tên lỗi', 'Ngày lỗi', 'Ngày gửi', 'Ngày nhận'],
+          faults.map(h => [h.seq, h.fault, h.fault_date, h.sent_date, h.return_date]))
+      : emptyNote());
+
+    const calibTitle = makeEl('h6', 'Lịch sử Calib');
+    calibTitle.className = 'mt-3';
+    frag.appendChild(calibTitle);
+    frag.appendChild(calibs.length
+      ? buildHistoryTable(
+          ['Seq', 'Ngày calib', 'Ngày hết hạn'],
+          calibs.map(h => [h.seq, h.calib_date, h.expire_date]))
+      : emptyNote());
+  }
+
+  const filesEl = await filesPromise;
+
+  const layout = document.createElement('div');
+  layout.className = 'row';
+
+  const histCol = document.createElement('div');
+  histCol.className = 'col-md-7';
+  histCol.appendChild(frag);
+  layout.appendChild(histCol);
+
+  const filesCol = document.createElement('div');
+  filesCol.className = 'col-md-5';
+  filesCol.append(makeEl('h6', '📎 File đính kèm'), filesEl);
+  layout.appendChild(filesCol);
+
+  td.appendChild(layout);
+  tr.appendChild(td);
+  row.parentNode.insertBefore(tr, row.nextSibling);
+
+  historyLoading[serial] = false;
+}
+
+async function uploadFiles(serial, input) {
+  if (!input || input.files.length === 0) {
+    alert("Chọn ít nhất 1 file");
+    return;
+  }
+
+  const fd = new FormData();
+  for (const f of input.files) {
+    fd.append("files", f);
+  }
+
+  const res = await fetch(`/api/assets/${encodeURIComponent(serial)}/files`, {
+    method: "POST",
+    body: fd
+  });
+
+  if (!res.ok) {
+    let msg = "Upload file thất bại";
+    try {
+      const data = await res.json();
+      if (data.error) msg = data.error;
+    } catch (e) {}
+
+    alert(msg);
+    return;
+  }
+
+
+  // Reload lại history + file
+  toggleHistory(
+    document.querySelector(`tr[data-serial="${CSS.escape(serial)}"]`),
+    serial
+  );
+}
+
+
+async function renderFiles(serial) {
+  const res = await fetch(`/api/assets/${encodeURIComponent(serial)}/files`);
+  const files = await res.json();
+
+  // dựng bằng DOM + addEventListener: serial/tên file không đi vào HTML hay JS inline
+  const wrap = document.createElement("div");
+
+  const uploadBox = document.createElement("div");
+  uploadBox.className = "mb-2";
+  const input = document.createElement("input");
+  input.type = "file";
+  input.className = "form-control form-control-sm";
+  input.multiple = true;
+  const uploadBtn = makeEl("button", "Thêm file");
+  uploadBtn.className = "btn btn-sm btn-success mt-1";
+  uploadBtn.addEventListener("click", () => uploadFiles(serial, input));
+  uploadBox.append(input, uploadBtn);
+  wrap.appendChild(uploadBox);
+
+  if (!files.length) {
+    wrap.appendChild(makeEl("em", "Chưa có file đính kèm"));
+    return wrap;
+  }
+
+  const table = document.createElement("table");
+  table.className = "table table-sm";
+  const headRow = table.createTHead().insertRow();
+  for (const h of ["Tên file", "Dung lượng", "Ngày", "Thao tác"]) {
+    headRow.appendChild(makeEl("th", h));
+  }
+  headRow.lastChild.width = "120";
+
+  const tbody = table.createTBody();
+  for (const f of files) {
+    const tr = tbody.insertRow();
+    tr.insertCell().textContent = f.file_name;
+    tr.insertCell().textContent = formatFileSize(f.file_size);
+    tr.insertCell().textContent = (f.created_at || "").substring(0,10);
+
+    const actions = tr.insertCell();
+    const dlBtn = makeEl("button", "Tải");
+    dlBtn.className = "btn btn-sm btn-outline-primary";
+    dlBtn.addEventListener("click", () => downloadFile(f.id));
+    const delBtn = makeEl("button", "Xóa");
+    delBtn.className = "btn btn-sm btn-outline-danger ms-1";
+    delBtn.addEventListener("click", () => deleteFile(f.id, serial));
+    actions.append(dlBtn, delBtn);
+  }
+
+  wrap.appendChild(table);
+  return wrap;
+}
+
+
+async function downloadFile(id) {
+  const res = await fetch(`/api/assets/files/${id}/download`);
+  const data = await res.json();
+  if (data.url) window.open(data.url, "_blank");
+}
+
+async function deleteFile(id, serial) {
+  if (!confirm("Bạn có chắc muốn xóa file này?")) return;
+
+  const res = await fetch(`/api/assets/files/${id}`, { method: "DELETE" });
+  if (!res.ok) return alert("Xóa file thất bại");
+
+  // reload lại history + file
+  toggleHistory(
+    document.querySelector(`tr[data-serial="${CSS.escape(serial)}"]`),
+    serial
+  );
+}
+
+
+document.addEventListener('DOMContentLoaded', ()=>{
+  initSorting();
+  initRowClicks();
+  initLazyRows();
+  // để trình duyệt vẽ khung trang trước, rồi mới tải dữ liệu
+  (window.requestIdleCallback || setTimeout)(() => loadTable(), 0);
+});
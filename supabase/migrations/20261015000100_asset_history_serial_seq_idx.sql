@@ -0,0 +1,5 @@
+-- Lịch sử được đọc theo serial và sắp theo seq
+-- (api_get_history_by_serial, tính seq kế tiếp trong api_add_history).
+-- Index này cho phép Postgres trả về đúng thứ tự mà không cần sort.
+create index if not exists asset_history_serial_seq_idx
+    on asset_history (serial, seq);
@@ -0,0 +1,14 @@
+-- Tra cứu tài sản theo serial / mã / CLC / invoice
+-- (get, delete, kiểm tra trùng, bulk insert, file đính kèm).
+create index if not exists assets_serial_idx on assets (serial);
+create index if not exists assets_code_idx on assets (code);
+create index if not exists assets_clc_idx on assets (clc);
+create index if not exists assets_invoice_no_idx on assets (invoice_no);
+create index if not exists asset_files_serial_idx on asset_files (serial);
+
+-- find_asset_by_identifier so khớp bằng ILIKE (không phân biệt hoa thường),
+-- b-tree thường không dùng được → index trigram.
+create extension if not exists pg_trgm;
+create index if not exists assets_serial_trgm_idx on assets using gin (serial gin_trgm_ops);
+create index if not exists assets_code_trgm_idx on assets using gin (code gin_trgm_ops);
+create index if not exists assets_clc_trgm_idx on assets using gin (clc gin_trgm_ops);
@@ -0,0 +1,33 @@
+-- Mã tài sản là duy nhất: INSERT/UPDATE trùng mã báo lỗi 23505 (unique_violation),
+-- app bắt lỗi này thay vì SELECT kiểm tra trước.
+-- Partial index: bỏ qua tài sản chưa có mã (NULL / chuỗi rỗng).
+--
+-- Trước khi chạy: dữ liệu cũ không được có mã trùng, nếu không index sẽ không tạo được.
+-- Kiểm tra bằng:
+--   select code, count(*) from assets
+--   where code is not null and code <> ''
+--   group by code having count(*) > 1;
+-- Sửa hết các mã trùng rồi mới chạy migration này.
+do $$
+declare
+  dup_codes text;
+begin
+  select string_agg(code, ', ') into dup_codes
+  from (
+    select code from assets
+    where code is not null and code <> ''
+    group by code having count(*) > 1
+  ) d;
+
+  if dup_codes is not null then
+    raise exception 'assets.code bị trùng, sửa trước khi tạo assets_code_unique: %', dup_codes;
+  end if;
+end;
+$$;
+
+create unique index if not exists assets_code_unique
+  on assets (code)
+  where code is not null and code <> '';
+
+-- assets_code_unique đã phục vụ tra cứu theo code
+drop index if exists assets_code_idx;
@@ -0,0 +1,41 @@
+-- Thêm lịch sử cho tài sản trong một lần gọi RPC:
+-- kiểm tra tài sản tồn tại, cấp seq = max(seq)+1 và INSERT ngay trong Postgres.
+-- Nhận một mảng jsonb (một hoặc nhiều bản ghi), trả về các dòng vừa thêm.
+create or replace function add_asset_history(entries jsonb)
+returns setof asset_history
+language plpgsql
+as $$
+declare
+  e jsonb;
+  s text;
+  next_seq asset_history.seq%type;
+begin
+  for e in select value from jsonb_array_elements(entries) loop
+    s := e->>'serial';
+
+    if not exists (select 1 from assets where serial = s) then
+      raise exception 'Asset not found: %', s using errcode = 'P0002';
+    end if;
+
+    -- khóa theo serial để hai request đồng thời không lấy trùng seq
+    perform pg_advisory_xact_lock(hashtext('asset_history:' || s));
+
+    select coalesce(max(seq), 0) + 1 into next_seq
+    from asset_history
+    where serial = s;
+
+    return query
+      insert into asset_history (
+        serial, type, seq,
+        fault, fault_date, sent_date, return_date,
+        calib_date, expire_date
+      )
+      select
+        s, r.type, next_seq,
+        r.fault, r.fault_date, r.sent_date, r.return_date,
+        r.calib_date, r.expire_date
+      from jsonb_populate_record(null::asset_history, e) r
+      returning *;
+  end loop;
+end;
+$$;
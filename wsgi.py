@@ -0,0 +1,8 @@
+# wsgi.py
+# Entry point cho gunicorn (gevent): patch socket/ssl/threading TRƯỚC mọi import khác,
+# để các request tới Supabase (httpx) nhường CPU khi chờ mạng.
+
+from gevent import monkey
+monkey.patch_all()
+
+from app import app  # noqa: E402